@@ -1,5 +1,7 @@
 from typing import Dict, Any, List
+import asyncio
 import logging
+import os
 import random
 from core.ncbi_entrez import NCBIEntrezAPI
 from core.uniprot_api import UniProtAPI
@@ -8,18 +10,43 @@ from core.uniprot_api import UniProtAPI
 # Ideally, we should have a `core/types.py` or similar, but I'll import from orchestrator
 from core.types import RareAgentState
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+PUBMED_SOURCE = "PubMed"
+NO_PHENOTYPE = "No specific phenotype description."
+
+def _summarize_protein(prot: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flattens a UniProt entry into a genetic target in a single descent:
+    gene name, primary accession, recommended protein name and the first DISEASE note.
+    """
+    genes = prot.get("genes")
+    gene_name = (genes[0].get("geneName") or {}).get("value") if genes else "Unknown"
+
+    # Stop at the first DISEASE comment instead of materializing the list
+    phenotype = NO_PHENOTYPE
+    for comment in prot.get("comments") or ():
+        if comment.get("commentType") == "DISEASE":
+            phenotype = (comment.get("note") or {}).get("text")
+            break
+
+    recommended_name = (prot.get("proteinDescription") or {}).get("recommendedName") or {}
+    return {
+        "gene_name": gene_name,
+        "uniprot_id": prot.get("primaryAccession"),
+        "protein_name": (recommended_name.get("fullName") or {}).get("value"),
+        "phenotype_association": phenotype
+    }
+
 class ExplorerAgent:
     """
     Explorer Agent: Gathers multi-omics data for a given orphan disease.
     Implements 'Guilt-by-Association' logic to identify targets.
     """
-    def __init__(self):
-        self.ncbi_api = NCBIEntrezAPI()
-        self.uniprot_api = UniProtAPI()
+    def __init__(self, uniprot_api: UniProtAPI = None):
+        # NCBI asks clients to identify themselves; NCBI_API_KEY is picked up by the client itself
+        self.ncbi_api = NCBIEntrezAPI(email=os.getenv("NCBI_EMAIL", "email@example.com"), tool="RareAgent")
+        self.uniprot_api = uniprot_api or UniProtAPI()
 
     def run(self, state: RareAgentState) -> Dict[str, Any]:
         """
@@ -31,19 +58,40 @@ class ExplorerAgent:
             logger.error("No disease specified in state.")
             return {"evidence": [], "genetic_targets": []}
 
-        logger.info(f"Explorer Agent started for disease: {disease_name}")
+        logger.info("Explorer Agent started for disease: %s", disease_name)
+        return self._state_updates(self._gather_evidence(disease_name), self._find_targets(disease_name))
 
+    async def arun(self, state: RareAgentState) -> Dict[str, Any]:
+        """
+        Async entry point for the graph. The PubMed search and the UniProt target search don't
+        depend on each other, so they run concurrently in worker threads: max(T_pubmed, T_uniprot).
+        """
+        disease_name = state.get("current_disease")
+        if not disease_name:
+            logger.error("No disease specified in state.")
+            return {"evidence": [], "genetic_targets": []}
+
+        logger.info("Explorer Agent started for disease: %s", disease_name)
+        evidence, genetic_targets = await asyncio.gather(
+            asyncio.to_thread(self._gather_evidence, disease_name),
+            asyncio.to_thread(self._find_targets, disease_name)
+        )
+        return self._state_updates(evidence, genetic_targets)
+
+    def _gather_evidence(self, disease_name: str) -> List[Dict[str, Any]]:
         # 1. Search PubMed for the disease to get context (and potentially key genes mentioned in titles/abstracts)
         # For this version, we'll focus on getting UIDs to establish "evidence" foundation.
         logger.info("Step 1: Gathering literature evidence...")
         try:
             search_res = self.ncbi_api.search_pubmed(f"{disease_name}[Title/Abstract]", retmax=50) # Limit for demo
             uids = search_res.get("esearchresult", {}).get("idlist", [])
-            evidence = [{"source": "PubMed", "id": uid, "note": f"Linked to {disease_name}"} for uid in uids]
+            # One record per source carrying the full id list, rather than one dict per UID
+            return [{"source": PUBMED_SOURCE, "note": f"Linked to {disease_name}", "ids": uids}] if uids else []
         except Exception as e:
-            logger.error(f"PubMed search failed: {e}")
-            evidence = []
+            logger.error("PubMed search failed: %s", e)
+            return []
 
+    def _find_targets(self, disease_name: str) -> List[Dict[str, Any]]:
         # 2. Identify associated targets (Guilt-by-Association) using UniProt
         # We search UniProt for proteins associated with the disease name.
         # This mocks the "guilt" part by finding proteins that *are* the disease mechanism or closely related.
@@ -52,45 +100,32 @@ class ExplorerAgent:
         try:
             # Query UniProt for human proteins related to the disease
             query = f'(cc_disease:"{disease_name}") AND organism_id:9606 AND reviewed:true'
-            proteins = self.uniprot_api.get_uniprot_data(query, format="json")
+            proteins = self.uniprot_api.get_uniprot_data(query, format="json", fields=UniProtAPI.DISEASE_FIELDS)
             
-            for prot in proteins:
-                # Extract Gene Name and Primary Accession
-                primary_accession = prot.get("primaryAccession")
-                genes = prot.get("genes", [])
-                gene_name = genes[0].get("geneName", {}).get("value") if genes else "Unknown"
-                
-                # Extract Disease Comments (Phenotypes/Mechanism)
-                comments = prot.get("comments", [])
-                disease_comment = next((c for c in comments if c.get("commentType") == "DISEASE"), None)
-                phenotype = disease_comment.get("note", {}).get("text") if disease_comment else "No specific phenotype description."
-
-                target_info = {
-                    "gene_name": gene_name,
-                    "uniprot_id": primary_accession,
-                    "protein_name": prot.get("proteinDescription", {}).get("recommendedName", {}).get("fullName", {}).get("value"),
-                    "phenotype_association": phenotype
-                }
-                genetic_targets.append(target_info)
-                
+            genetic_targets = [_summarize_protein(prot) for prot in proteins]
+
         except Exception as e:
-             logger.error(f"UniProt search failed: {e}")
+             logger.error("UniProt search failed: %s", e)
 
-        logger.info(f"Found {len(genetic_targets)} potential genetic targets.")
+        logger.info("Found %s potential genetic targets.", len(genetic_targets))
         
         # Shuffle targets to ensure the Proponent sees a randomized priority list on every run
         if genetic_targets:
             random.shuffle(genetic_targets)
+        return genetic_targets
 
+    @staticmethod
+    def _state_updates(evidence: List[Dict[str, Any]], genetic_targets: List[Dict[str, Any]]) -> Dict[str, Any]:
         # Update State
         # In a real LangGraph, we'd append or merge. Here we return the updates.
         return {
-            "evidence": evidence, # Append logic would be handled by the graph reducer usually
+            "evidence": evidence, # Appended to the state by the graph reducer
             "genetic_targets": genetic_targets, # New field for state
             # We don't generate hypotheses yet; that's for the Proponent agent (future).
         }
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     # Test Run
     agent = ExplorerAgent()
     mock_state = {"current_disease": "Cystic Fibrosis"}
@@ -1,10 +1,10 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Iterable
+import asyncio
 import dspy
 import logging
 from core.types import RareAgentState
+from core.llm import LM_MAX_TOKENS
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # --- DSPy Signatures ---
@@ -15,7 +15,7 @@ class GenerateHypothesis(dspy.Signature):
     Suggest an EXISTING APPROVED drug that modulates the identified target to treat the disease.
     """
     disease_name = dspy.InputField(desc="The name of the orphan disease.")
-    genetic_targets = dspy.InputField(desc="List of identified genetic targets and phenotypes.")
+    genetic_targets = dspy.InputField(desc="Identified genetic targets as '|'-separated 'gene;uniprot_id;phenotype' records.")
     existing_hypotheses = dspy.InputField(desc="List of already proposed drugs to avoid duplicates.")
     excluded_drugs = dspy.InputField(desc="A list of drugs that have already been evaluated. You MUST NOT propose any drug on this list.", default="")
     last_rejection_reason = dspy.InputField(desc="If your previous hypothesis was REJECTED, this is the exact reason. You MUST read this and correct your next hypothesis to avoid this error.", default="")
@@ -25,6 +25,98 @@ class GenerateHypothesis(dspy.Signature):
     mechanism = dspy.OutputField(desc="Mechanism of action (e.g., Inhibitor, Agonist, Chaperone).")
     rationale = dspy.OutputField(desc="Scientific rationale for why this drug would work for this disease context.")
 
+class GenerateHypotheses(dspy.Signature):
+    """
+    Synthesize disease and target data to propose several novel drug repurposing hypotheses.
+    Suggest DISTINCT EXISTING APPROVED drugs that modulate the identified targets to treat the disease.
+    """
+    disease_name = dspy.InputField(desc="The name of the orphan disease.")
+    genetic_targets = dspy.InputField(desc="Identified genetic targets as '|'-separated 'gene;uniprot_id;phenotype' records.")
+    existing_hypotheses = dspy.InputField(desc="List of already proposed drugs to avoid duplicates.")
+    excluded_drugs = dspy.InputField(desc="A list of drugs that have already been evaluated. You MUST NOT propose any drug on this list.", default="")
+    last_rejection_reason = dspy.InputField(desc="If your previous hypothesis was REJECTED, this is the exact reason. You MUST read this and correct your next hypothesis to avoid this error.", default="")
+    num_hypotheses: int = dspy.InputField(desc="How many hypotheses to propose, each with a different drug.")
+
+    hypotheses: List[Dict[str, str]] = dspy.OutputField(desc="The proposed hypotheses, each an object with keys 'drug_name' (existing approved drug), 'target_gene' (exact primary gene symbol or UniProt ID only), 'mechanism' (e.g., Inhibitor, Agonist, Chaperone) and 'rationale'.")
+
+# --- Prompt Serialization ---
+# The Proponent runs on every retry, so its fixed-structure inputs are kept compact.
+
+PHENOTYPE_MAX_CHARS = 80
+# Output budget added per hypothesis in a batch call (drug, target, mechanism and a rationale paragraph),
+# on top of the single-call budget that covers the reasoning trace
+BATCH_TOKENS_PER_HYPOTHESIS = 250
+
+def _compact_targets(targets: List[Dict[str, Any]]) -> str:
+    """Serializes targets as 'gene;uniprot_id;phenotype' records joined by '|'."""
+    return "|".join(
+        f"{t.get('gene_name')};{t.get('uniprot_id')};{(t.get('phenotype_association') or '')[:PHENOTYPE_MAX_CHARS]}"
+        for t in targets
+    )
+
+def _shortlist_targets(targets: List[Dict[str, Any]], k: int = 5) -> List[Dict[str, Any]]:
+    """
+    Picks up to k distinct genes, preferring targets with richer phenotype descriptions.
+    The Explorer shuffles its targets, so the same gene (different accessions) may repeat.
+    Ties are broken by gene and accession, so the same targets always serialize to the same
+    prompt and repeat runs hit the LM response cache.
+    """
+    ranked = sorted(
+        targets,
+        key=lambda t: (-len(t.get("phenotype_association") or ""), t.get("gene_name") or "", t.get("uniprot_id") or "")
+    )
+    seen = set()
+    shortlist = []
+    for target in ranked:
+        gene = target.get("gene_name")
+        if gene in seen:
+            continue
+        seen.add(gene)
+        shortlist.append(target)
+        if len(shortlist) == k:
+            break
+    return shortlist
+
+def _set_literal(names: Iterable[str]) -> str:
+    """
+    Renders drug names as a single de-duplicated set literal, e.g. '{Aspirin,Metformin}'.
+    Names are sorted: set iteration order changes between processes, and the prompt must not.
+    """
+    if not names:
+        return "None"
+    return "{" + ",".join(sorted({n for n in names if n})) + "}"
+
+def _rejection_prompt(last_rejection_reason) -> str:
+    """Turns the Validator's last rejection reason into a self-correction instruction."""
+    if not last_rejection_reason:
+        return ""
+    return f"CRITICAL: Your previous hypothesis was REJECTED by the deterministic database for the following reason: '{last_rejection_reason}'. You MUST read this error and adjust your next target or rationale to completely avoid making this same mistake. Strictly select a valid target."
+
+# Compiled once per process and shared by every ProponentAgent, so optimized
+# prompts/demos (e.g. from BootstrapFewShot) survive agent re-instantiation.
+_GENERATE_PROGRAM = None
+
+def _get_generate_program():
+    global _GENERATE_PROGRAM
+    if _GENERATE_PROGRAM is None:
+        _GENERATE_PROGRAM = dspy.ChainOfThought(GenerateHypothesis)
+    return _GENERATE_PROGRAM
+
+_GENERATE_BATCH_PROGRAM = None
+
+def _get_generate_batch_program():
+    global _GENERATE_BATCH_PROGRAM
+    if _GENERATE_BATCH_PROGRAM is None:
+        _GENERATE_BATCH_PROGRAM = dspy.ChainOfThought(GenerateHypotheses)
+    return _GENERATE_BATCH_PROGRAM
+
+def _batch_lm(k: int):
+    """The configured LM with an output cap sized for k hypotheses (None if no LM is configured)."""
+    lm = dspy.settings.lm
+    if lm is None:
+        return None
+    return lm.copy(max_tokens=LM_MAX_TOKENS + k * BATCH_TOKENS_PER_HYPOTHESIS)
+
 # --- Proponent Agent ---
 
 class ProponentAgent:
@@ -32,7 +124,8 @@ class ProponentAgent:
     Proponent Agent: Generates drug repurposing hypotheses using LLM reasoning.
     """
     def __init__(self):
-        self.generate_program = dspy.ChainOfThought(GenerateHypothesis)
+        self.generate_program = _get_generate_program()
+        self.generate_batch_program = _get_generate_batch_program()
 
     def run(self, state: RareAgentState) -> Dict[str, Any]:
         """
@@ -41,25 +134,24 @@ class ProponentAgent:
         disease_name = state.get("current_disease")
         targets = state.get("genetic_targets", [])
         current_hypotheses = state.get("hypotheses", [])
-        evaluated_drugs = state.get("evaluated_drugs", [])
+        evaluated_drugs = state.get("evaluated_drugs", frozenset())
         
         existing_drugs = [h.get("drug_name") for h in current_hypotheses]
 
-        logger.info(f"Proponent Agent generating hypothesis for {disease_name}...")
+        logger.info("Proponent Agent generating hypothesis for %s...", disease_name)
         
         if not targets:
             logger.warning("No genetic targets found. Cannot generate specific hypothesis.")
-            return {"hypotheses": current_hypotheses}
+            return {}
 
         # Convert targets to a prompt-friendly string
-        targets_str = "\n".join([f"- {t.get('gene_name')} ({t.get('uniprot_id')}): {t.get('phenotype_association')}" for t in targets[:5]]) # Limit to top 5 for context window
+        targets_str = _compact_targets(_shortlist_targets(targets, k=5)) # Limit to top 5 for context window
 
         try:
             # Check for rejection feedback
             last_rejection_reason = state.get("last_rejection_reason")
-            rejection_prompt = ""
-            if last_rejection_reason:
-                rejection_prompt = f"CRITICAL: Your previous hypothesis was REJECTED by the deterministic database for the following reason: '{last_rejection_reason}'. You MUST read this error and adjust your next target or rationale to completely avoid making this same mistake. Strictly select a valid target."
+            rejection_prompt = _rejection_prompt(last_rejection_reason)
+            if rejection_prompt:
                 logger.info("Proponent Agent applying self-correction from previous rejection.")
 
             # Generate Hypothesis
@@ -68,9 +160,9 @@ class ProponentAgent:
             prediction = self.generate_program(
                 disease_name=disease_name,
                 genetic_targets=targets_str,
-                existing_hypotheses=", ".join(existing_drugs) if existing_drugs else "None",
+                existing_hypotheses=_set_literal(existing_drugs),
                 last_rejection_reason=rejection_prompt,
-                excluded_drugs=", ".join(evaluated_drugs) if evaluated_drugs else "None"
+                excluded_drugs=_set_literal(evaluated_drugs)
             )
 
             new_hypothesis = {
@@ -82,36 +174,97 @@ class ProponentAgent:
                 "status": "PROPOSED"
             }
             
-            logger.info(f"Proposed: {new_hypothesis['drug_name']} targeting {new_hypothesis['target_gene']}")
-            
-            # Append to state and taboo list
-            updated_hypotheses = current_hypotheses + [new_hypothesis]
-            updated_evaluated_drugs = evaluated_drugs + [prediction.drug_name]
+            logger.info("Proposed: %s targeting %s", new_hypothesis['drug_name'], new_hypothesis['target_gene'])
             
+            # Only the delta: the state reducers append it to the hypotheses and taboo list
             return {
-                "hypotheses": updated_hypotheses,
-                "evaluated_drugs": updated_evaluated_drugs
+                "hypotheses": [new_hypothesis],
+                "evaluated_drugs": [prediction.drug_name]
             }
 
         except Exception as e:
-            logger.error(f"Proponent Agent failed: {e}")
-            return {"hypotheses": current_hypotheses}
+            logger.error("Proponent Agent failed: %s", e)
+            return {}
+
+    def run_batch(self, state: RareAgentState, k: int) -> Dict[str, Any]:
+        """
+        Generates up to k hypotheses with distinct drugs in a single LM call, so a round of
+        candidates costs one round trip instead of k. Falls back to run() (one hypothesis)
+        if the batch call fails or yields nothing usable.
+        """
+        disease_name = state.get("current_disease")
+        targets = state.get("genetic_targets", [])
+        evaluated_drugs = state.get("evaluated_drugs", frozenset())
+
+        logger.info("Proponent Agent generating %s hypotheses for %s...", k, disease_name)
+
+        if not targets:
+            logger.warning("No genetic targets found. Cannot generate specific hypothesis.")
+            return {}
+        if k <= 1:
+            return self.run(state)
+
+        try:
+            # A truncated JSON answer would fail to parse and silently fall back to single calls,
+            # so the output cap grows with the batch size
+            with dspy.context(lm=_batch_lm(k)):
+                prediction = self.generate_batch_program(
+                    disease_name=disease_name,
+                    genetic_targets=_compact_targets(_shortlist_targets(targets, k=5)),
+                    existing_hypotheses=_set_literal([h.get("drug_name") for h in state.get("hypotheses", [])]),
+                    last_rejection_reason=_rejection_prompt(state.get("last_rejection_reason")),
+                    excluded_drugs=_set_literal(evaluated_drugs),
+                    num_hypotheses=k
+                )
+        except Exception as e:
+            logger.error("Proponent Agent batch generation failed, falling back to a single hypothesis: %s", e)
+            return self.run(state)
+
+        # The LM may repeat itself or ignore the taboo list; keep the first proposal per drug
+        seen = {d.lower() for d in evaluated_drugs if d}
+        new_hypotheses = []
+        for candidate in prediction.hypotheses or []:
+            drug_name = str(candidate.get("drug_name") or "").strip()
+            if not drug_name or drug_name.lower() in seen:
+                continue
+            seen.add(drug_name.lower())
+            new_hypotheses.append({
+                "drug_name": drug_name,
+                "target_gene": candidate.get("target_gene"),
+                "mechanism": candidate.get("mechanism"),
+                "rationale": candidate.get("rationale"),
+                "source": "ProponentAgent",
+                "status": "PROPOSED"
+            })
+            if len(new_hypotheses) == k:
+                break
+
+        if not new_hypotheses:
+            logger.warning("Batch generation returned no new drugs, falling back to a single hypothesis.")
+            return self.run(state)
+
+        logger.info("Proposed: %s", ", ".join(f"{h['drug_name']} -> {h['target_gene']}" for h in new_hypotheses))
+        return {
+            "hypotheses": new_hypotheses,
+            "evaluated_drugs": [h["drug_name"] for h in new_hypotheses]
+        }
+
+    async def arun(self, state: RareAgentState) -> Dict[str, Any]:
+        """Async entry point for the graph: runs the blocking workflow in a worker thread."""
+        return await asyncio.to_thread(self.run, state)
+
+    async def arun_batch(self, state: RareAgentState, k: int) -> Dict[str, Any]:
+        """Async entry point for run_batch."""
+        return await asyncio.to_thread(self.run_batch, state, k)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     # Test Run (Requires configured LM)
     # Using a Mock/Dummy LM for demonstration if not configured
     try:
-        import os
-        from dotenv import load_dotenv
+        from core.llm import configure_lm
 
-        load_dotenv()
-        
-        api_key = os.environ.get('GROQ_API_KEY')
-        if not api_key:
-            print("WARNING: GROQ_API_KEY not found! Please check your .env file.")
-            raise ValueError("GROQ_API_KEY environment variable not set")
-        lm = dspy.LM(model='groq/llama-3.3-70b-versatile', api_key=api_key)
-        dspy.settings.configure(lm=lm)
+        configure_lm()
         
         agent = ProponentAgent()
         state = {
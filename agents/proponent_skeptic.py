@@ -0,0 +1,136 @@
+from typing import Dict, Any
+import asyncio
+import dspy
+import logging
+from agents.proponent import ProponentAgent, _compact_targets, _shortlist_targets, _set_literal, _rejection_prompt
+from agents.skeptic import SkepticAgent, _normalize_verdict
+from core.types import RareAgentState
+from core.llm import LM_MAX_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# --- DSPy Signatures ---
+
+class ProposeAndCritique(dspy.Signature):
+    """
+    Synthesize disease and target data to propose a novel drug repurposing hypothesis.
+    Suggest an EXISTING APPROVED drug that modulates the identified target to treat the disease.
+    Then act as an aggressive clinical auditor of that proposal: look for pharmacological RED FLAGS,
+    specifically Dose-Limiting Toxicities (DLTs), severe off-target effects (e.g., hERG inhibition),
+    and Phase II clinical trial failures.
+    """
+    disease_name = dspy.InputField(desc="The name of the orphan disease.")
+    genetic_targets = dspy.InputField(desc="Identified genetic targets as '|'-separated 'gene;uniprot_id;phenotype' records.")
+    existing_hypotheses = dspy.InputField(desc="List of already proposed drugs to avoid duplicates.")
+    excluded_drugs = dspy.InputField(desc="A list of drugs that have already been evaluated. You MUST NOT propose any drug on this list.", default="")
+    last_rejection_reason = dspy.InputField(desc="If your previous hypothesis was REJECTED, this is the exact reason. You MUST read this and correct your next hypothesis to avoid this error.", default="")
+
+    drug_name = dspy.OutputField(desc="Name of the proposed existing approved drug.")
+    target_gene = dspy.OutputField(desc="The exact, primary gene symbol or UniProt ID only. No explanations, no parentheses, no extra text.")
+    mechanism = dspy.OutputField(desc="Mechanism of action (e.g., Inhibitor, Agonist, Chaperone).")
+    rationale = dspy.OutputField(desc="Scientific rationale for why this drug would work for this disease context.")
+    critique = dspy.OutputField(desc="A detailed clinical critique of the hypothesis.")
+    safety_concerns = dspy.OutputField(desc="Specific safety risks (DLTs, off-targets).")
+    verdict = dspy.OutputField(desc="Final verdict: 'SAFE' or 'RISKY' or 'REJECT'.")
+
+# The fused call writes what the Proponent and Skeptic calls write separately (proposal plus a
+# detailed critique), so it gets both of their output caps; a truncated answer would fail to
+# parse and fall back to the two separate calls.
+DEBATE_MAX_TOKENS = 2 * LM_MAX_TOKENS
+
+# Compiled once per process and shared by every ProponentSkepticAgent (see proponent.py).
+_DEBATE_PROGRAM = None
+
+def _get_debate_program():
+    global _DEBATE_PROGRAM
+    if _DEBATE_PROGRAM is None:
+        _DEBATE_PROGRAM = dspy.ChainOfThought(ProposeAndCritique)
+    return _DEBATE_PROGRAM
+
+def _debate_lm():
+    """The configured LM with the fused call's output cap (None if no LM is configured)."""
+    lm = dspy.settings.lm
+    if lm is None:
+        return None
+    return lm.copy(max_tokens=DEBATE_MAX_TOKENS)
+
+# --- Fused Proponent + Skeptic Agent ---
+
+class ProponentSkepticAgent:
+    """
+    Proponent + Skeptic in a single LLM call: proposes a hypothesis and critiques it in one completion.
+    Falls back to the separate Proponent and Skeptic agents if the fused call fails.
+    """
+    def __init__(self, proponent: ProponentAgent = None, skeptic: SkepticAgent = None):
+        self.debate_program = _get_debate_program()
+        self.proponent = proponent or ProponentAgent()
+        self.skeptic = skeptic or SkepticAgent()
+
+    def run(self, state: RareAgentState) -> Dict[str, Any]:
+        """
+        Executes the fused debate step.
+        Returns the Proponent and Skeptic state updates merged together.
+        """
+        disease_name = state.get("current_disease")
+        targets = state.get("genetic_targets", [])
+        current_hypotheses = state.get("hypotheses", [])
+        evaluated_drugs = state.get("evaluated_drugs", frozenset())
+
+        existing_drugs = [h.get("drug_name") for h in current_hypotheses]
+
+        logger.info("Proponent+Skeptic generating and critiquing hypothesis for %s...", disease_name)
+
+        if not targets:
+            logger.warning("No genetic targets found. Cannot generate specific hypothesis.")
+            return {}
+
+        try:
+            with dspy.context(lm=_debate_lm()):
+                prediction = self.debate_program(
+                    disease_name=disease_name,
+                    genetic_targets=_compact_targets(_shortlist_targets(targets, k=5)),
+                    existing_hypotheses=_set_literal(existing_drugs),
+                    last_rejection_reason=_rejection_prompt(state.get("last_rejection_reason")),
+                    excluded_drugs=_set_literal(evaluated_drugs)
+                )
+        except Exception as e:
+            logger.error("Fused Proponent+Skeptic call failed, falling back to separate agents: %s", e)
+            return self._run_separately(state)
+
+        verdict = _normalize_verdict(prediction.verdict)
+        new_hypothesis = {
+            "drug_name": prediction.drug_name,
+            "target_gene": prediction.target_gene,
+            "mechanism": prediction.mechanism,
+            "rationale": prediction.rationale,
+            "source": "ProponentSkepticAgent",
+            "status": "PROPOSED",
+            "skeptic_critique": prediction.critique,
+            "skeptic_safety": prediction.safety_concerns,
+            "skeptic_verdict": verdict
+        }
+
+        critique_entry = (
+            f"### Skeptic Critique: {prediction.drug_name}\n"
+            f"**Verdict**: {verdict}\n"
+            f"**Safety Concerns**: {prediction.safety_concerns}\n"
+            f"**Analysis**: {prediction.critique}\n"
+        )
+
+        logger.info("Proposed: %s targeting %s (verdict: %s)", new_hypothesis['drug_name'], new_hypothesis['target_gene'], verdict)
+
+        return {
+            "hypotheses": [new_hypothesis],
+            "evaluated_drugs": [prediction.drug_name],
+            "debate_history": [critique_entry]
+        }
+
+    async def arun(self, state: RareAgentState) -> Dict[str, Any]:
+        """Async entry point for the graph: runs the blocking workflow in a worker thread."""
+        return await asyncio.to_thread(self.run, state)
+
+    def _run_separately(self, state: RareAgentState) -> Dict[str, Any]:
+        """Runs the original two-call Proponent -> Skeptic sequence."""
+        updates = self.proponent.run(state)
+        updates.update(self.skeptic.run({**state, **updates}))
+        return updates
@@ -1,10 +1,11 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple, get_args
+import asyncio
 import dspy
 import logging
-from core.types import RareAgentState
+from concurrent.futures import ThreadPoolExecutor
+from dspy.utils.exceptions import AdapterParseError
+from core.types import RareAgentState, Verdict
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # --- DSPy Signatures ---
@@ -24,6 +25,33 @@ class ClinicalCritique(dspy.Signature):
     safety_concerns = dspy.OutputField(desc="Specific safety risks (DLTs, off-targets).")
     verdict = dspy.OutputField(desc="Final verdict: 'SAFE' or 'RISKY' or 'REJECT'.")
 
+VALID_VERDICTS = frozenset(get_args(Verdict))
+
+# Independent critiques in flight at once; Groq serves concurrent completions
+MAX_CONCURRENT_CRITIQUES = 8
+
+# Compiled once per process and shared by every SkepticAgent (see proponent.py).
+# The common path is a plain Predict (no reasoning trace); ChainOfThought is only
+# used as a fallback when the verdict comes back ambiguous.
+_CRITIQUE_PROGRAM = None
+_CRITIQUE_COT_PROGRAM = None
+
+def _get_critique_program():
+    global _CRITIQUE_PROGRAM
+    if _CRITIQUE_PROGRAM is None:
+        _CRITIQUE_PROGRAM = dspy.Predict(ClinicalCritique)
+    return _CRITIQUE_PROGRAM
+
+def _get_critique_cot_program():
+    global _CRITIQUE_COT_PROGRAM
+    if _CRITIQUE_COT_PROGRAM is None:
+        _CRITIQUE_COT_PROGRAM = dspy.ChainOfThought(ClinicalCritique)
+    return _CRITIQUE_COT_PROGRAM
+
+def _normalize_verdict(verdict) -> str:
+    """Strips quotes/whitespace/punctuation the LM may wrap around the verdict."""
+    return str(verdict or "").strip().strip("'\".*").strip().upper()
+
 # --- Skeptic Agent ---
 
 class SkepticAgent:
@@ -31,79 +59,101 @@ class SkepticAgent:
     Skeptic Agent: Provides adversarial critique using LLM reasoning.
     """
     def __init__(self):
-        self.critique_program = dspy.ChainOfThought(ClinicalCritique)
+        self.critique_program = _get_critique_program()
+        self._cot = _get_critique_cot_program()
 
     def run(self, state: RareAgentState) -> Dict[str, Any]:
         """
         Executes the Skeptic Agent workflow.
-        Critiques the *latest* hypothesis added by the Proponent.
+        Critiques every hypothesis not yet critiqued (normally just the *latest* one added by the Proponent).
         """
         hypotheses = state.get("hypotheses", [])
-        debate_history = state.get("debate_history", [])
         
         if not hypotheses:
             logger.warning("No hypotheses to critique.")
-            return {"hypotheses": [], "debate_history": debate_history}
+            return {}
 
-        # Get the latest hypothesis
-        latest_hypothesis = hypotheses[-1]
-        drug_name = latest_hypothesis.get("drug_name")
-        
         # Avoid critiquing if already critiqued (simple check)
-        if latest_hypothesis.get("skeptic_verdict"):
-             logger.info(f"Hypothesis for {drug_name} already critiqued.")
-             return {"hypotheses": hypotheses, "debate_history": debate_history}
+        pending = [h for h in hypotheses if not h.get("skeptic_verdict")]
+        if not pending:
+             logger.info("Hypothesis for %s already critiqued.", hypotheses[-1].get("drug_name"))
+             return {}
 
-        logger.info(f"Skeptic Agent critiquing: {drug_name}...")
+        # Critiques are independent LM calls, so they share wall-clock latency; map() keeps hypothesis order
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CRITIQUES) as executor:
+            results = [r for r in executor.map(self._critique_one, pending) if r is not None]
+
+        if not results:
+            return {}
+
+        # We return only the critiqued hypotheses and the new history entries; the reducers merge/append them
+        return {
+            "hypotheses": [critiqued for critiqued, _ in results],
+            "debate_history": [entry for _, entry in results]
+        }
+
+    async def arun(self, state: RareAgentState) -> Dict[str, Any]:
+        """Async entry point for the graph: runs the blocking workflow in a worker thread."""
+        return await asyncio.to_thread(self.run, state)
+
+    def _critique_one(self, hypothesis: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], str]]:
+        """
+        Critiques a single hypothesis.
+        Returns (critiqued copy of the hypothesis, debate history entry), or None if the LM call failed.
+        """
+        drug_name = hypothesis.get("drug_name")
+        logger.info("Skeptic Agent critiquing: %s...", drug_name)
 
         try:
             # Generate Critique
-            prediction = self.critique_program(
+            critique_inputs = dict(
                 drug_name=drug_name,
-                target_gene=latest_hypothesis.get("target_gene", "Unknown"),
-                mechanism=latest_hypothesis.get("mechanism", "Unknown"),
-                rationale=latest_hypothesis.get("rationale", "Unknown")
+                target_gene=hypothesis.get("target_gene", "Unknown"),
+                mechanism=hypothesis.get("mechanism", "Unknown"),
+                rationale=hypothesis.get("rationale", "Unknown")
             )
+            # The verdict is free text (Groq's JSON mode enforces no schema); it is normalized below,
+            # and a malformed JSON answer takes the same reasoning fallback as an ambiguous verdict
+            try:
+                prediction = self.critique_program(**critique_inputs)
+                verdict = _normalize_verdict(prediction.verdict)
+            except AdapterParseError:
+                logger.info("Unparseable critique for %s.", drug_name)
+                verdict = None
+
+            # Only pay for a reasoning trace when the direct answer is ambiguous
+            if verdict not in VALID_VERDICTS:
+                logger.info("Ambiguous verdict. Re-running critique with reasoning.")
+                prediction = self._cot(**critique_inputs)
+                verdict = _normalize_verdict(prediction.verdict)
 
             critique_entry = (
                 f"### Skeptic Critique: {drug_name}\n"
-                f"**Verdict**: {prediction.verdict}\n"
+                f"**Verdict**: {verdict}\n"
                 f"**Safety Concerns**: {prediction.safety_concerns}\n"
                 f"**Analysis**: {prediction.critique}\n"
             )
 
-            # Update Hypothesis with critique data
-            latest_hypothesis["skeptic_critique"] = prediction.critique
-            latest_hypothesis["skeptic_safety"] = prediction.safety_concerns
-            latest_hypothesis["skeptic_verdict"] = prediction.verdict
-
-            # Update State
-            updated_history = debate_history + [critique_entry]
-            
-            # We return updated hypotheses list (with the modified last item) and history
-            return {
-                "hypotheses": hypotheses, 
-                "debate_history": updated_history
+            # Copy of the hypothesis with critique data; the state reducer merges it by hypothesis_id
+            critiqued_hypothesis = {
+                **hypothesis,
+                "skeptic_critique": prediction.critique,
+                "skeptic_safety": prediction.safety_concerns,
+                "skeptic_verdict": verdict
             }
+            return critiqued_hypothesis, critique_entry
 
         except Exception as e:
-            logger.error(f"Skeptic Agent failed: {e}")
-            return {}
+            logger.error("Skeptic Agent failed: %s", e)
+            return None
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     # Test Run (Requires configured LM)
     try:
-        import os
-        from dotenv import load_dotenv
+        from core.llm import configure_lm
 
-        load_dotenv()
-        
-        api_key = os.environ.get('GROQ_API_KEY')
-        if not api_key:
-            print("WARNING: GROQ_API_KEY not found! Please check your .env file.")
-            raise ValueError("GROQ_API_KEY environment variable not set")
-        lm = dspy.LM(model='groq/llama-3.3-70b-versatile', api_key=api_key)
-        dspy.settings.configure(lm=lm)
+        configure_lm()
         
         agent = SkepticAgent()
         state = {
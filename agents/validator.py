@@ -1,109 +1,92 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Callable
+import asyncio
 import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from core.pubchem_api import PubChemAPI
 from core.uniprot_api import UniProtAPI
 # Assuming RareAgentState is importable from orchestrator or a common types file
 from core.types import RareAgentState
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# PubChem/UniProt lookups are I/O bound; keep in-flight validations within public API rate limits
+MAX_CONCURRENT_VALIDATIONS = 3
+
+_PARENTHESIZED = re.compile(r"\(([^)]+)\)")
+
+def _gene_key(target_gene) -> str:
+    """Normalizes a proposed target so 'cftr ' and 'CFTR' are validated once, as the same target."""
+    return str(target_gene or "").strip().upper()
+
+def _compile_disease_pattern(search_term: str) -> re.Pattern:
+    """
+    Compiles the normalized disease name and its aliases into one alternation, so each
+    haystack is scanned once regardless of the number of terms.
+    "cystic fibrosis (cf)" also matches "cystic fibrosis" and the whole word "cf".
+    """
+    alternatives = [re.escape(search_term)]
+    aliases = _PARENTHESIZED.findall(search_term)
+    base_name = _PARENTHESIZED.sub("", search_term).strip()
+    if aliases and base_name:
+        alternatives.append(re.escape(base_name))
+    alternatives.extend(rf"\b{re.escape(alias.strip())}\b" for alias in aliases if alias.strip())
+    return re.compile("|".join(alternatives), re.IGNORECASE)
+
 class ValidatorAgent:
     """
     Validator Agent: Deterministically verifies drug-target assumptions.
     NO LLM usage. Strict step-by-step cross-referencing.
     """
-    def __init__(self):
-        self.pubchem_api = PubChemAPI()
-        self.uniprot_api = UniProtAPI()
+    def __init__(self, pubchem_api: PubChemAPI = None, uniprot_api: UniProtAPI = None):
+        self.pubchem_api = pubchem_api or PubChemAPI()
+        self.uniprot_api = uniprot_api or UniProtAPI()
 
     def run(self, state: RareAgentState) -> Dict[str, Any]:
         """
-        Validates hypotheses in the state.
-        Returns updated hypotheses list with validation status.
+        Validates the hypotheses in the state that have no validation report yet.
+        Returns only those hypotheses (with validation status); the state reducer merges them by hypothesis_id.
         """
         hypotheses = state.get("hypotheses", [])
-        validated_hypotheses = []
+        disease_name = state.get("current_disease")
 
-        for hypothesis in hypotheses:
-            drug_name = hypothesis.get("drug_name")
-            target_gene = hypothesis.get("target_gene")
-            proposed_mechanism = hypothesis.get("mechanism")
-            
-            logger.info(f"Validating Hypothesis: {drug_name} -> {target_gene}")
-            
-            validation_report = {
-                "step_1_cid_found": False,
-                "step_2_target_match": False, # Inferred via activity or direct link
-                "step_3_human_reviewed": False,
-                "step_4_disease_link": False,
-                "overall_status": "REJECTED",
-                "reason": ""
-            }
-
-            try:
-                # Step 1: Standardize Drug Name to CID
-                cid = self._step_1_get_cid(drug_name)
-                if not cid:
-                    validation_report["reason"] = "Drug CID not found."
-                    hypothesis["validation"] = validation_report
-                    validated_hypotheses.append(hypothesis)
-                    continue
-                validation_report["step_1_cid_found"] = True
-                hypothesis["cid"] = cid
-
-                # Step 2: Verify Target Association (Drug -> Target)
-                # This is complex. We'll check if the drug has active assays against the target.
-                # For this MVP, we will try to find if the Target Gene is mentioned in the drug's assay summaries
-                # OR (simpler for now) verify the Target Gene exists and is a valid target in general.
-                # True "Drug -> Target" validation requires parsing massive bioassay XMLs or using a specific "targets" endpoint if available.
-                # Here, we will validate the TARGET itself exists as a valid human protein first.
-                
-                # Step 3: Translate/Verify Target (Gene -> UniProt) & Step 4: Biological Validation
-                uniprot_entry = self._step_3_4_verify_target(target_gene)
-                if not uniprot_entry:
-                     validation_report["reason"] = f"Target {target_gene} not found as valid Human Reviewed protein."
-                     hypothesis["validation"] = validation_report
-                     validated_hypotheses.append(hypothesis)
-                     continue
-                validation_report["step_3_human_reviewed"] = True
-                validation_report["step_2_target_match"] = True # We assume if both exist, the link is plausible for *retrieval* stage validation (weak check)
-                
-                # Step 5: Disease Link (Gene -> Disease)
-                # Using a mock for Orphadata as requested, or inferring from UniProt "Disease" comments if available.
-                disease_linked = self._step_5_verify_disease_link(uniprot_entry, state.get("current_disease"))
-                if not disease_linked:
-                    validation_report["reason"] = f"Target {target_gene} not confirmed linked to {state.get('current_disease')}."
-                    hypothesis["validation"] = validation_report
-                    validated_hypotheses.append(hypothesis)
-                    continue
-                validation_report["step_4_disease_link"] = True
-                
-                # If all pass
-                validation_report["overall_status"] = "APPROVED"
-                validation_report["reason"] = "All deterministic checks passed."
-                
-            except Exception as e:
-                logger.error(f"Validation error for {drug_name}: {e}")
-                validation_report["reason"] = f"Error: {str(e)}"
+        # Hypotheses validated on an earlier pass keep their report; only new ones are checked.
+        pending = [h for h in hypotheses if "validation" not in h]
 
-            hypothesis["validation"] = validation_report
-            validated_hypotheses.append(hypothesis)
+        # Step 1 for every hypothesis up front: each distinct drug name is resolved once, and
+        # hypotheses whose drug is unknown are rejected before any UniProt call.
+        cids = self.pubchem_api.get_compound_cids_batch([h.get("drug_name") for h in pending])
+
+        # current_disease is fixed for the whole run: normalize it and compile its pattern once
+        disease_link_checker = self._make_disease_link_checker(disease_name)
+
+        # Steps 2-5 only depend on the target, and a batch of hypotheses often shares one (e.g. several
+        # CFTR modulators), so each distinct target is checked once. The checks are dominated by blocking
+        # UniProt round trips, so fan the targets out over a small thread pool.
+        genes = list(dict.fromkeys(_gene_key(h.get("target_gene")) for h in pending if cids.get(h.get("drug_name"))))
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_VALIDATIONS) as executor:
+            target_reports = dict(zip(genes, executor.map(
+                lambda gene: self._validate_target(gene, disease_name, disease_link_checker),
+                genes
+            )))
+
+        validated_hypotheses = [
+            self._validate_one(h, disease_name, cids.get(h.get("drug_name")), target_reports)
+            for h in pending
+        ]
 
         # Increment retry_count if the latest hypothesis was rejected
         current_retry_count = state.get("retry_count", 0)
         last_rejection_reason = None
         
-        if validated_hypotheses:
-            latest = validated_hypotheses[-1]
+        if validated_hypotheses or hypotheses:
+            latest = validated_hypotheses[-1] if validated_hypotheses else hypotheses[-1]
             latest_status = latest.get("validation", {}).get("overall_status", "REJECTED")
             
             if latest_status != "APPROVED":
                 current_retry_count += 1
                 last_rejection_reason = latest.get("validation", {}).get("reason", "Unknown validator error")
-                logger.info(f"Hypothesis REJECTED. Reason: {last_rejection_reason}. Retry count: {current_retry_count}/3")
+                logger.info("Hypothesis REJECTED. Reason: %s. Retry count: %s/3", last_rejection_reason, current_retry_count)
             else:
                 logger.info("Hypothesis APPROVED. No retry needed.")
 
@@ -113,15 +96,113 @@ class ValidatorAgent:
             "last_rejection_reason": last_rejection_reason
         }
 
-    def _step_1_get_cid(self, drug_name: str) -> Optional[int]:
-        """Gets CID for drug name."""
+    async def arun(self, state: RareAgentState) -> Dict[str, Any]:
+        """Async entry point for the graph: runs the blocking workflow in a worker thread."""
+        return await asyncio.to_thread(self.run, state)
+
+    def _validate_one(self, hypothesis: Dict[str, Any], disease_name: Optional[str], cid: Optional[int],
+                      target_reports: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Runs the deterministic validation steps for a single hypothesis.
+        `cid` is the drug's PubChem CID resolved in batch by run() (None if not found).
+        `target_reports` maps normalized gene symbols to the step 2-5 results computed by run();
+        a target missing from it is checked here.
+        Returns a copy of the hypothesis with its validation report attached.
+        """
+        hypothesis = dict(hypothesis)
+        drug_name = hypothesis.get("drug_name")
+        target_gene = hypothesis.get("target_gene")
+        
+        logger.info("Validating Hypothesis: %s -> %s", drug_name, target_gene)
+        
+        validation_report = {
+            "step_1_cid_found": False,
+            "step_2_target_match": False, # Inferred via activity or direct link
+            "step_3_human_reviewed": False,
+            "step_4_disease_link": False,
+            "overall_status": "REJECTED",
+            "reason": ""
+        }
+
+        # Step 1: Standardize Drug Name to CID (resolved in batch)
+        if not cid:
+            validation_report["reason"] = "Drug CID not found."
+            hypothesis["validation"] = validation_report
+            return hypothesis
+        validation_report["step_1_cid_found"] = True
+        hypothesis["cid"] = cid
+
+        gene = _gene_key(target_gene)
+        target_report = (target_reports or {}).get(gene)
+        if target_report is None:
+            target_report = self._validate_target(gene, disease_name)
+        validation_report.update(target_report)
+
+        hypothesis["validation"] = validation_report
+        return hypothesis
+
+    def _validate_target(self, target_gene: str, disease_name: Optional[str],
+                         disease_link_checker: Optional[Callable[[Dict], bool]] = None) -> Dict[str, Any]:
+        """
+        Steps 2-5 for one target gene; they don't depend on the drug.
+        `disease_link_checker` is the step 5 check built once per run; built here if not given.
+        Returns the step flags, overall_status and reason to merge into a validation report.
+        """
+        report = {
+            "step_2_target_match": False,
+            "step_3_human_reviewed": False,
+            "step_4_disease_link": False,
+            "overall_status": "REJECTED",
+            "reason": ""
+        }
+
         try:
-            data = self.pubchem_api.get_compound_by_name(drug_name)
-            if "PC_Compounds" in data and len(data["PC_Compounds"]) > 0:
-                return data["PC_Compounds"][0]["id"]["id"]["cid"]
-        except Exception:
-            return None
-        return None
+            # Step 2: Verify Target Association (Drug -> Target)
+            # This is complex. We'll check if the drug has active assays against the target.
+            # For this MVP, we will try to find if the Target Gene is mentioned in the drug's assay summaries
+            # OR (simpler for now) verify the Target Gene exists and is a valid target in general.
+            # True "Drug -> Target" validation requires parsing massive bioassay XMLs or using a specific "targets" endpoint if available.
+            # Here, we will validate the TARGET itself exists as a valid human protein first.
+            
+            # Fast path: let UniProt apply the disease filter server-side. A hit satisfies steps 3-5 at once;
+            # only a miss needs the step-by-step checks below to produce a precise rejection reason.
+            if self._verify_linked_target(target_gene, disease_name):
+                report.update({
+                    "step_2_target_match": True,
+                    "step_3_human_reviewed": True,
+                    "step_4_disease_link": True,
+                    "overall_status": "APPROVED",
+                    "reason": "All deterministic checks passed."
+                })
+                return report
+
+            # Step 3: Translate/Verify Target (Gene -> UniProt) & Step 4: Biological Validation
+            uniprot_entry = self._step_3_4_verify_target(target_gene)
+            if not uniprot_entry:
+                 report["reason"] = f"Target {target_gene} not found as valid Human Reviewed protein."
+                 return report
+            report["step_3_human_reviewed"] = True
+            report["step_2_target_match"] = True # We assume if both exist, the link is plausible for *retrieval* stage validation (weak check)
+            
+            # Step 5: Disease Link (Gene -> Disease)
+            # Using a mock for Orphadata as requested, or inferring from UniProt "Disease" comments if available.
+            if disease_link_checker is None:
+                disease_link_checker = self._make_disease_link_checker(disease_name)
+            disease_linked = disease_link_checker(uniprot_entry)
+            if not disease_linked:
+                report["reason"] = f"Target {target_gene} not confirmed linked to {disease_name}."
+                return report
+            report["step_4_disease_link"] = True
+            
+            # If all pass
+            report["overall_status"] = "APPROVED"
+            report["reason"] = "All deterministic checks passed."
+            
+        except Exception as e:
+            logger.error("Validation error for target %s: %s", target_gene, e)
+            report["reason"] = f"Error: {str(e)}"
+
+        return report
 
     def _step_3_4_verify_target(self, gene_name: str) -> Optional[Dict]:
         """
@@ -130,62 +211,85 @@ class ValidatorAgent:
         """
         query = f'gene_exact:"{gene_name}" AND organism_id:9606 AND reviewed:true'
         try:
-            results = self.uniprot_api.get_uniprot_data(query, format="json")
+            results = self.uniprot_api.get_uniprot_data(query, format="json", fields=UniProtAPI.DISEASE_FIELDS)
             if results and len(results) > 0:
                 return results[0] # Return best match
         except Exception:
             return None
         return None
 
+    def _verify_linked_target(self, gene_name: str, disease_name: Optional[str]) -> Optional[Dict]:
+        """
+        Combined steps 3-5: human reviewed entry for the gene that UniProt itself links to the disease.
+        Returns the UniProt entry if found.
+        """
+        if not disease_name:
+            return None
+        disease_term = disease_name.replace('"', "")
+        query = f'gene_exact:"{gene_name}" AND organism_id:9606 AND reviewed:true AND cc_disease:"{disease_term}"'
+        try:
+            results = self.uniprot_api.get_uniprot_data(query, format="json", fields=UniProtAPI.DISEASE_FIELDS)
+            if results:
+                return results[0]
+        except Exception:
+            return None
+        return None
+
     def _step_5_verify_disease_link(self, uniprot_entry: Dict, disease_name: str) -> bool:
         """
         Verifies if the protein is linked to the disease.
         Uses case-insensitive partial string matching across all UniProt disease comment fields.
         """
+        return self._make_disease_link_checker(disease_name)(uniprot_entry)
+
+    def _make_disease_link_checker(self, disease_name: Optional[str]) -> Callable[[Dict], bool]:
+        """
+        Specializes the step 5 check for one disease: the name is normalized and compiled
+        (plus any aliases) into a single pattern up front, so each call only scans the entry.
+        """
         if not disease_name:
-            return False
-        
+            return lambda uniprot_entry: False
+
         search_term = disease_name.lower().replace("'", "").strip()
-        
-        # 1. Check UniProt Comments — search across ALL text fields in DISEASE comments
-        comments = uniprot_entry.get("comments", [])
-        for comment in comments:
-            if comment.get("commentType") == "DISEASE":
-                # Check the disease description/note text
-                note_text = comment.get("note", {})
-                if isinstance(note_text, dict):
-                    note_str = note_text.get("text", "")
-                elif isinstance(note_text, str):
-                    note_str = note_text
-                else:
-                    note_str = str(note_text)
-                
-                note_str_clean = note_str.lower().replace("'", "")
-                if search_term in note_str_clean:
-                    return True
-                
-                # Check the disease object itself (name, acronym, description)
-                disease_obj = comment.get("disease", {})
-                if disease_obj:
-                    db_disease_name = disease_obj.get("diseaseId", "").lower().replace("'", "")
-                    db_disease_desc = disease_obj.get("description", "").lower().replace("'", "")
-                    db_disease_acr = disease_obj.get("acronym", "").lower().replace("'", "")
-                    
-                    # Case-insensitive partial match: user input IN database string OR database string IN user input
-                    if (search_term in db_disease_name or db_disease_name in search_term or
-                        search_term in db_disease_desc or
-                        search_term in db_disease_acr or db_disease_acr in search_term):
-                        return True
-        
-        # 2. Fallback: Check protein description for disease name mention
-        protein_desc = uniprot_entry.get("proteinDescription", {})
-        rec_name = protein_desc.get("recommendedName", {}).get("fullName", {}).get("value", "")
-        if search_term in rec_name.lower().replace("'", ""):
-            return True
-        
-        return False
+        pattern = _compile_disease_pattern(search_term)
+        extract = self._extract_disease_strings
+
+        def check(uniprot_entry: Dict) -> bool:
+            texts, names = extract(uniprot_entry)
+            # User input IN any database string, or a database disease name/acronym IN user input
+            return any(pattern.search(text) for text in texts) or any(name in search_term for name in names)
+
+        return check
+
+    @staticmethod
+    def _extract_disease_strings(uniprot_entry: Dict) -> Tuple[List[str], List[str]]:
+        """
+        Flattens the disease-relevant text of a UniProt entry in a single walk.
+        Returns (texts, names), lowercased with apostrophes removed and empties dropped:
+        texts are DISEASE comment notes, ids, descriptions, acronyms plus the recommended protein name;
+        names are the disease ids and acronyms, which are also matched the other way round.
+        """
+        texts = []
+        names = []
+        for comment in uniprot_entry.get("comments", []):
+            if comment.get("commentType") != "DISEASE":
+                continue
+            note = comment.get("note") or ""
+            texts.append(note.get("text", "") if isinstance(note, dict) else str(note))
+            disease_obj = comment.get("disease") or {}
+            disease_id = disease_obj.get("diseaseId", "")
+            acronym = disease_obj.get("acronym", "")
+            texts.extend((disease_id, disease_obj.get("description", ""), acronym))
+            names.extend((disease_id, acronym))
+
+        # Fallback: protein description may mention the disease
+        texts.append(uniprot_entry.get("proteinDescription", {}).get("recommendedName", {}).get("fullName", {}).get("value", ""))
+
+        clean = lambda strings: [c for c in (x.lower().replace("'", "") for x in strings) if c]
+        return clean(texts), clean(names)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     # Test Run
     agent = ValidatorAgent()
     
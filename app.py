@@ -1,22 +1,28 @@
 import streamlit as st
 import dspy
-import os
 import threading
 from dotenv import load_dotenv
-from orchestrator import run_research
-from visuals.radar_chart import create_radar_chart
+from orchestrator import run_research, NODE_STARTED
+from core.types import merge_hypotheses
+from core.llm import configure_lm
+from visuals.radar_chart import create_radar_chart, scores_signature
 
 # --- Configure Groq LM (cached to survive Streamlit reruns) ---
 load_dotenv(override=True)
 
+# Status label shown while a graph node is running
+NODE_LABELS = {
+    "explorer": "🔍 Explorer is mining UniProt and PubMed...",
+    "proponent": "🧪 Proponent is drafting hypotheses...",
+    "debate": "🧪 Proponent and Skeptic are debating...",
+    "critique": "🛡️ Skeptic and Validator are reviewing...",
+    "validator": "⚖️ Validator is checking the databases...",
+}
+
 @st.cache_resource
 def setup_llm():
-    api_key = os.getenv("GROQ_API_KEY", "").strip().strip('"').strip("'")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not found! Please check your .env file.")
-    lm = dspy.LM(model='groq/llama-3.3-70b-versatile', api_key=api_key, temperature=0.7)
     dspy.settings.main_ti = threading.get_ident()
-    dspy.settings.configure(lm=lm)
+    configure_lm()
     return True
 
 try:
@@ -72,12 +78,25 @@ st.markdown(
     """
 )
 
-# --- Render Existing Chat Log ---
-for msg in st.session_state.chat_log:
-    role = msg["role"]
-    avatar = "🧑‍🔬" if role == "user" else "🤖"
-    with st.chat_message(role, avatar=avatar):
-        st.markdown(msg["content"])
+# --- Chat Log ---
+# All messages live in one container; while the swarm runs only the new message is appended to it
+messages_container = st.container()
+st.session_state.swarm_running = bool(launch_btn and disease_name)
+
+def post_message(role, content):
+    """Records a chat message and renders just that message."""
+    st.session_state.chat_log.append({"role": role, "content": content})
+    with messages_container:
+        st.chat_message(role, avatar="🧑‍🔬" if role == "user" else "🤖").markdown(content)
+
+# Replay the previous run's log on ordinary reruns; a new run starts from an empty log
+if not st.session_state.swarm_running:
+    with messages_container:
+        for msg in st.session_state.chat_log:
+            role = msg["role"]
+            avatar = "🧑‍🔬" if role == "user" else "🤖"
+            with st.chat_message(role, avatar=avatar):
+                st.markdown(msg["content"])
 
 # --- Swarm Execution ---
 if launch_btn and disease_name:
@@ -92,18 +111,27 @@ if launch_btn and disease_name:
     st.session_state.radar_chart = None
 
     # Add user message
-    user_msg = {"role": "user", "content": f"Initiating RareAgent swarm for: **{disease_name}**..."}
-    st.session_state.chat_log.append(user_msg)
-    with st.chat_message("user", avatar="🧑‍🔬"):
-        st.markdown(user_msg["content"])
+    post_message("user", f"Initiating RareAgent swarm for: **{disease_name}**...")
 
     # Create a placeholder for the status spinner
     status_placeholder = st.empty()
 
+    # Node updates only carry the hypotheses they touched; rebuild the full list for the radar chart
+    all_hypotheses = []
+    radar_signature = ()
+
+    def render_radar():
+        st.session_state.radar_chart = create_radar_chart(all_hypotheses)
+        radar_placeholder.plotly_chart(st.session_state.radar_chart, use_container_width=True)
+
     with status_placeholder.status("🔬 Swarm is running...", expanded=True) as status:
         for event in run_research(disease_name):
             node_name = list(event.keys())[0]
-            state_update = event[node_name]
+            if node_name == NODE_STARTED:
+                status.update(label=NODE_LABELS.get(event[node_name], "🔬 Swarm is running..."))
+                continue
+            state_update = event[node_name] or {}
+            all_hypotheses = merge_hypotheses(all_hypotheses, state_update.get("hypotheses", []))
 
             if node_name == "explorer":
                 targets = state_update.get("genetic_targets", [])
@@ -113,61 +141,45 @@ if launch_btn and disease_name:
                     top = targets[0]
                     msg_text += f"\n\n*Top Target*: `{top['gene_name']}` (`{top['uniprot_id']}`)"
                 st.write(f"Explorer found {count} targets...")
-                assistant_msg = {"role": "assistant", "content": msg_text}
-                st.session_state.chat_log.append(assistant_msg)
-                with st.chat_message("assistant", avatar="🤖"):
-                    st.markdown(msg_text)
-
-            elif node_name == "proponent":
-                hypotheses = state_update.get("hypotheses", [])
-                if hypotheses:
-                    latest = hypotheses[-1]
-                    msg_text = f"🧪 **Proponent**: Proposed **{latest['drug_name']}** targeting `{latest['target_gene']}`.\n\n*Rationale*: {latest.get('rationale', 'N/A')}"
-                    st.write(f"Proponent proposed: {latest['drug_name']}")
-                    assistant_msg = {"role": "assistant", "content": msg_text}
-                    st.session_state.chat_log.append(assistant_msg)
-                    with st.chat_message("assistant", avatar="🤖"):
-                        st.markdown(msg_text)
-
-            elif node_name == "skeptic":
+                post_message("assistant", msg_text)
+
+            # The fused "debate" node carries both the proposal and its critique
+            if node_name in ("proponent", "debate"):
+                # A batched Proponent round proposes several hypotheses at once
+                for proposed in state_update.get("hypotheses", []):
+                    msg_text = f"🧪 **Proponent**: Proposed **{proposed['drug_name']}** targeting `{proposed['target_gene']}`.\n\n*Rationale*: {proposed.get('rationale', 'N/A')}"
+                    st.write(f"Proponent proposed: {proposed['drug_name']}")
+                    post_message("assistant", msg_text)
+
+            # The "critique" node carries both the Skeptic's and the Validator's results
+            if node_name in ("skeptic", "debate", "critique"):
                 history = state_update.get("debate_history", [])
-                hypotheses = state_update.get("hypotheses", [])
-                if history:
-                    latest_critique = history[-1]
-                    msg_text = f"🛡️ **Skeptic**: {latest_critique}"
+                for critique in history:
+                    msg_text = f"🛡️ **Skeptic**: {critique}"
                     st.write("Skeptic delivered critique...")
-                    assistant_msg = {"role": "assistant", "content": msg_text}
-                    st.session_state.chat_log.append(assistant_msg)
-                    with st.chat_message("assistant", avatar="🤖"):
-                        st.markdown(msg_text)
-
-                # Update radar chart
-                if hypotheses:
-                    st.session_state.radar_chart = create_radar_chart(hypotheses)
-                    radar_placeholder.plotly_chart(st.session_state.radar_chart, use_container_width=True)
-
-            elif node_name == "validator":
-                hypotheses = state_update.get("hypotheses", [])
-                if hypotheses:
-                    latest = hypotheses[-1]
-                    validation = latest.get("validation", {})
+                    post_message("assistant", msg_text)
+
+            if node_name in ("validator", "critique"):
+                for validated in state_update.get("hypotheses", []):
+                    validation = validated.get("validation", {})
                     overall_status = validation.get("overall_status", "UNKNOWN")
-                    msg_text = f"⚖️ **Validator**: Status -> **{overall_status}**."
+                    msg_text = f"⚖️ **Validator**: {validated.get('drug_name')} -> **{overall_status}**."
                     if overall_status != "APPROVED":
                         msg_text += f"\n\n*Reason*: {validation.get('reason', 'N/A')}"
                     st.write(f"Validator: {overall_status}")
-                    assistant_msg = {"role": "assistant", "content": msg_text}
-                    st.session_state.chat_log.append(assistant_msg)
-                    with st.chat_message("assistant", avatar="🤖"):
-                        st.markdown(msg_text)
+                    post_message("assistant", msg_text)
+
+            # Redraw the radar chart only when the plotted scores actually changed
+            signature = scores_signature(all_hypotheses)
+            if signature != radar_signature:
+                radar_signature = signature
+                render_radar()
 
         status.update(label="✅ Swarm Mission Complete!", state="complete", expanded=False)
 
     # Final message
-    complete_msg = {"role": "assistant", "content": "✅ **Mission Complete**."}
-    st.session_state.chat_log.append(complete_msg)
-    with st.chat_message("assistant", avatar="🤖"):
-        st.markdown(complete_msg["content"])
+    post_message("assistant", "✅ **Mission Complete**.")
+    st.session_state.swarm_running = False
 
 elif launch_btn and not disease_name:
     st.sidebar.warning("Please enter a disease name before launching the swarm.")
@@ -0,0 +1,81 @@
+import os
+import functools
+import logging
+import threading
+import time
+from collections import OrderedDict
+import diskcache
+
+logger = logging.getLogger(__name__)
+
+# Persistent cache for slow-changing database lookups (PubMed, UniProt, PubChem).
+CACHE_DIR = os.getenv("RAREAGENT_CACHE_DIR", os.path.join(".cache", "api"))
+DEFAULT_TTL = 7 * 24 * 60 * 60  # 7 days
+MEMORY_CACHE_SIZE = 4096
+
+_MISSING = object()
+_disk_cache = None
+_disk_lock = threading.Lock()
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the process-wide disk cache, opening it on first use."""
+    global _disk_cache
+    with _disk_lock:
+        if _disk_cache is None:
+            _disk_cache = diskcache.Cache(CACHE_DIR)
+        return _disk_cache
+
+
+def _remember(key, value, deadline):
+    """Keeps a value in the in-process LRU until `deadline` (time.time(); None = no expiry)."""
+    with _memory_lock:
+        _memory_cache[key] = (value, deadline)
+        _memory_cache.move_to_end(key)
+        if len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def cached(namespace, expire=DEFAULT_TTL):
+    """
+    Caches the results of an API client method.
+    Lookups go through an in-process LRU first, then the disk cache; only successful
+    calls are stored, so errors are retried on the next call.
+    The key is (namespace, *args, *sorted(kwargs)); `self` is not part of the key.
+    Both tiers honor `expire`: a memory entry lives no longer than its disk entry.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (namespace,) + args + tuple(sorted(kwargs.items()))
+
+            with _memory_lock:
+                entry = _memory_cache.get(key)
+                if entry is not None:
+                    value, deadline = entry
+                    if deadline is None or time.time() < deadline:
+                        _memory_cache.move_to_end(key)
+                        return value
+                    del _memory_cache[key]
+
+            value, deadline = get_cache().get(key, default=_MISSING, expire_time=True)
+            if value is _MISSING:
+                value = method(self, *args, **kwargs)
+                deadline = time.time() + expire if expire is not None else None
+                get_cache().set(key, value, expire=expire)
+            else:
+                logger.debug("Cache hit for %s", namespace)
+
+            _remember(key, value, deadline)
+            return value
+        return wrapper
+    return decorator
+
+
+def clear_cache():
+    """Drops every cached API response, both in memory and on disk."""
+    with _memory_lock:
+        _memory_cache.clear()
+    get_cache().clear()
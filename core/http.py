@@ -0,0 +1,113 @@
+import threading
+import time
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+from core.cache import get_cache
+
+# (connect, read) seconds; requests has no default timeout, so a stalled server would block a worker forever
+DEFAULT_TIMEOUT = (5, 30)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to requests that don't set one."""
+    def __init__(self, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        return super().send(request, timeout=timeout if timeout is not None else self.timeout, **kwargs)
+
+
+class ConditionalSession(requests.Session):
+    """
+    Session that revalidates GET responses with If-None-Match / If-Modified-Since.
+    Validators and bodies of 200 responses are kept in the disk cache; a 304 is answered with the stored body,
+    so unchanged resources cost a header round trip instead of a full download.
+    They are stored without expiry: they must outlive the @cached result they back, so that once that
+    result expires the refresh is revalidated rather than re-downloaded. Each 200 overwrites them.
+    """
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        if method.upper() != "GET" or kwargs.get("stream"):
+            return super().request(method, url, params=params, headers=headers, **kwargs)
+
+        key = ("http.conditional", requests.Request("GET", url, params=params).prepare().url)
+        stored = get_cache().get(key)
+        headers = dict(headers or {})
+        if stored:
+            if stored["etag"]:
+                headers["If-None-Match"] = stored["etag"]
+            if stored["last_modified"]:
+                headers["If-Modified-Since"] = stored["last_modified"]
+
+        response = super().request(method, url, params=params, headers=headers, **kwargs)
+
+        if response.status_code == 304 and stored:
+            response.status_code = 200
+            response._content = stored["content"]
+            response.headers = CaseInsensitiveDict(stored["headers"])
+            # Decode the replayed body as a fresh 200 would be, not by charset detection over the whole body
+            response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        elif response.status_code == 200:
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                get_cache().set(key, {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "headers": dict(response.headers),
+                    "content": response.content
+                }, expire=None)
+        return response
+
+
+def build_session(pool_size=20, retries=3, backoff_factor=1, status_forcelist=None, allowed_methods=None, timeout=DEFAULT_TIMEOUT, conditional=False):
+    """
+    Creates a requests.Session with a pooled, retrying HTTPAdapter and a default timeout.
+    Reusing one session per client keeps TCP/TLS connections alive across calls.
+    `conditional=True` returns a ConditionalSession that revalidates GETs with ETag/Last-Modified.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=status_forcelist,
+        allowed_methods=allowed_methods or Retry.DEFAULT_ALLOWED_METHODS
+    )
+    adapter = TimeoutHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry, timeout=timeout)
+
+    session = ConditionalSession() if conditional else requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def loads_json(response):
+    """Parses a JSON response body with orjson (much faster than response.json() on large UniProt pages)."""
+    return orjson.loads(response.content)
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by all workers of an API client.
+    acquire() blocks until a token is available; tokens refill at `rate` per second up to `capacity`.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
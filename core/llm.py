@@ -0,0 +1,45 @@
+import functools
+import os
+import dspy
+from dotenv import load_dotenv
+from core.llm_cache import configure_llm_cache
+
+GROQ_MODEL = "groq/llama-3.3-70b-versatile"
+# Output cap for single-hypothesis signatures (reasoning included); it only stops runaway generations.
+# Batch calls scale it with the number of hypotheses requested (see ProponentAgent.run_batch), and
+# the fused Proponent+Skeptic call doubles it (see ProponentSkepticAgent.run).
+LM_MAX_TOKENS = 512
+LM_TEMPERATURE = 0.3
+
+
+def groq_api_key():
+    """Reads GROQ_API_KEY from the environment or .env, tolerating quotes pasted around it."""
+    load_dotenv()
+    api_key = os.getenv("GROQ_API_KEY", "").strip().strip('"').strip("'")
+    if not api_key:
+        raise ValueError("GROQ_API_KEY not found! Please check your .env file.")
+    return api_key
+
+
+def get_lm(model=GROQ_MODEL):
+    """
+    Returns the process-wide DSPy LM for a model, built on first use with the persistent response cache.
+    Repeat callers (the app, smoke tests, agent test runs) share one client instead of rebuilding it.
+    """
+    return _build_lm(model, groq_api_key())
+
+
+@functools.lru_cache(maxsize=None)
+def _build_lm(model, api_key):
+    configure_llm_cache()
+    return dspy.LM(model=model, api_key=api_key, temperature=LM_TEMPERATURE, max_tokens=LM_MAX_TOKENS, cache=True)
+
+
+def configure_lm(model=GROQ_MODEL):
+    """
+    Makes get_lm(model) the default DSPy LM. JSONAdapter requests JSON mode from Groq instead of
+    free-form field markers, which avoids DSPy's format-repair retries.
+    """
+    lm = get_lm(model)
+    dspy.settings.configure(lm=lm, adapter=dspy.JSONAdapter())
+    return lm
@@ -0,0 +1,25 @@
+import os
+import threading
+import dspy
+
+# DSPy keys its LM response cache on a hash of the full request (model, messages, sampling kwargs)
+# and keeps it in memory and on disk. Kept next to the API cache so repeat runs of a disease,
+# and repeat runs of the smoke tests, skip identical Groq calls.
+LLM_CACHE_DIR = os.getenv("DSPY_CACHEDIR", os.path.join(".cache", "dspy"))
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure_llm_cache():
+    """Enables DSPy's memory + disk LM response cache under LLM_CACHE_DIR (once per process)."""
+    global _configured
+    with _configure_lock:
+        if not _configured:
+            dspy.configure_cache(enable_disk_cache=True, enable_memory_cache=True, disk_cache_dir=LLM_CACHE_DIR)
+            _configured = True
+
+
+def cache_hits(lm):
+    """Number of calls in the LM's history that were answered from the response cache."""
+    return sum(1 for entry in lm.history if getattr(entry.get("response"), "cache_hit", False))
@@ -1,26 +1,54 @@
+import asyncio
+import os
 import requests
-import time
+import urllib3
 import logging
-from xml.etree import ElementTree
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from lxml import etree
+from core.cache import cached
+from core.http import build_session, RateLimiter, loads_json
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# EFetch pages are fetched concurrently; the shared rate limiter, not the pool size, sets the pace
+MAX_FETCH_WORKERS = 10
+
+# Per-article field extractors, compiled once and evaluated in C by libxml2
+XP_PMID = etree.XPath("./MedlineCitation/PMID/text()")
+XP_TITLE = etree.XPath("string(./MedlineCitation/Article/ArticleTitle)")
+XP_ABSTRACT = etree.XPath("./MedlineCitation/Article/Abstract/AbstractText")
+XP_MESH = etree.XPath("./MedlineCitation/MeshHeadingList/MeshHeading/DescriptorName/text()")
+XP_TEXT = etree.XPath("string()")
+
 class NCBIEntrezAPI:
     """
     Interface for NCBI E-utilities (PubMed) with History Server and pagination support.
     """
     BASE_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"
     
-    def __init__(self, email="email@example.com", tool="OtherAgent"):
+    def __init__(self, email="email@example.com", tool="OtherAgent", api_key=None):
+        # E-utilities answers bursts with 429s and has transient 5xx; ESearch/EFetch are idempotent, POST included
+        self.session = build_session(
+            retries=5,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET", "POST"]
+        )
         self.params = {
             "db": "pubmed",
             "email": email,
             "tool": tool,
             "retmode": "json" 
         }
+        # An API key raises the E-utilities ceiling from 3 to 10 requests/sec; stay just under it
+        api_key = api_key or os.getenv("NCBI_API_KEY")
+        if api_key:
+            self.params["api_key"] = api_key
+        self.rate_limiter = RateLimiter(9 if api_key else 2.5)
 
+    # History server sessions (WebEnv) expire after a few hours, so search results are kept briefly
+    @cached("ncbi.esearch", expire=60 * 60)
     def search_pubmed(self, term, retmax=1000):
         """
         Searches PubMed for a term and returns UIDs.
@@ -34,15 +62,26 @@ class NCBIEntrezAPI:
             "retmax": retmax
         })
         
-        response = requests.get(endpoint, params=params)
+        # POST keeps long boolean terms (e.g. synonym expansions) clear of URL length limits
+        self.rate_limiter.acquire()
+        response = self.session.post(endpoint, data=params)
         response.raise_for_status()
-        return response.json()
+        return loads_json(response)
+
+    async def asearch_pubmed(self, term, retmax=1000):
+        """Async mirror of search_pubmed: runs the blocking search in a worker thread."""
+        return await asyncio.to_thread(self.search_pubmed, term, retmax)
+
+    async def afetch_details(self, uids_or_history, retmax=500):
+        """Async mirror of fetch_details; returns the articles as a list instead of a generator."""
+        return await asyncio.to_thread(lambda: list(self.fetch_details(uids_or_history, retmax)))
 
     def fetch_details(self, uids_or_history, retmax=500):
         """
         Fetches full details for a list of UIDs or a history object.
         Uses EFetch with pagination.
         Handles the 10k record limit using retstart/retmax.
+        Generator: yields one {"pmid", "title", "abstract", "mesh"} dict per article, parsed while the page streams in.
         """
         endpoint = f"{self.BASE_URL}/efetch.fcgi"
         
@@ -72,47 +111,96 @@ class NCBIEntrezAPI:
                  request_params["id"] = ",".join(uids)
 
         elif isinstance(uids_or_history, list):
-             # List of UIDs
+             # List of UIDs (sent in the POST body, so long lists don't overflow the URL)
              count = len(uids_or_history)
              request_params["id"] = ",".join(uids_or_history)
-             
-             # If too many UIDs for GET, we should ideally use POST (not implemented for simplicity here unless needed)
-             # But for pagination context, usually we use History.
-
-        # Pagination loop
-        results = []
-        for retstart in range(0, count, retmax):
-            logger.info(f"Fetching records {retstart} to {min(retstart + retmax, count)} of {count}...")
-            
-            chunk_params = request_params.copy()
-            chunk_params.update({
-                "retstart": retstart,
-                "retmax": retmax
-            })
-            
+
+        # Pagination: pages are independent, so up to MAX_FETCH_WORKERS requests are in flight while
+        # the current page is parsed. Pages are consumed in offset order, so articles keep PubMed's order.
+        offsets = iter(range(0, count, retmax))
+        with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+            submit = lambda retstart: executor.submit(self._fetch_chunk, endpoint, request_params, retstart, retmax, count)
+            in_flight = deque(submit(retstart) for _, retstart in zip(range(MAX_FETCH_WORKERS), offsets))
             try:
-                response = requests.get(endpoint, params=chunk_params)
-                response.raise_for_status()
-                # For now, just appending raw text/xml content. A real parser would process XML.
-                results.append(response.text)
-                
-                # Respect potential rate limits (3 requests/sec without API key, 10 w/ key)
-                time.sleep(0.34) 
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching chunk {retstart}: {e}")
-                continue
-
-        return results
+                while in_flight:
+                    response = in_flight.popleft().result()
+                    next_offset = next(offsets, None)
+                    if next_offset is not None:
+                        in_flight.append(submit(next_offset))
+                    if response is None:
+                        continue
+                    with response:
+                        try:
+                            yield from self._iter_articles(response.raw)
+                        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, etree.XMLSyntaxError) as e:
+                            # Read errors surface from the raw stream as urllib3 errors; skip to the next page
+                            logger.error("Error reading EFetch page: %s", e)
+            finally:
+                # The consumer stopped early (or something raised): release the pooled connections
+                # held by pages that were requested but never read
+                for future in in_flight:
+                    if not future.cancel():
+                        response = future.result()
+                        if response is not None:
+                            response.close()
+
+    def _fetch_chunk(self, endpoint, request_params, retstart, retmax, count):
+        """
+        Starts one EFetch page download. Returns the streaming response, or None if the request failed.
+        """
+        logger.info("Fetching records %s to %s of %s...", retstart, min(retstart + retmax, count), count)
+
+        chunk_params = request_params.copy()
+        chunk_params.update({
+            "retstart": retstart,
+            "retmax": retmax
+        })
+
+        try:
+            # Respect rate limits (3 requests/sec without API key, 10 w/ key) across all workers
+            self.rate_limiter.acquire()
+            # EFetch parameters go in the POST body: id lists of a few hundred UIDs would overflow a GET URL
+            response = self.session.post(endpoint, data=chunk_params, stream=True)
+            response.raise_for_status()
+            # Let urllib3 undo gzip so the parser reads plain XML off the socket
+            response.raw.decode_content = True
+            return response
+
+        except requests.exceptions.RequestException as e:
+            logger.error("Error fetching chunk %s: %s", retstart, e)
+            if e.response is not None:
+                e.response.close()
+            return None
+
+    @staticmethod
+    def _iter_articles(source):
+        """
+        Incrementally parses a PubmedArticleSet, yielding each article as soon as its end tag is read.
+        Finished articles are dropped from the tree, so memory stays bounded by one article.
+        """
+        # libxml2 does the tag filtering, so only PubmedArticle end events reach Python
+        for _, elem in etree.iterparse(source, events=("end",), tag="PubmedArticle", recover=True):
+            # XPath string results keep a reference to their element; copy them to plain str so cleared articles can be freed
+            pmid = XP_PMID(elem)
+            yield {
+                "pmid": str(pmid[0]) if pmid else None,
+                "title": str(XP_TITLE(elem)),
+                "abstract": " ".join(XP_TEXT(part) for part in XP_ABSTRACT(elem)),
+                "mesh": [str(term) for term in XP_MESH(elem)]
+            }
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     api = NCBIEntrezAPI()
     try:
         search_res = api.search_pubmed("cystic fibrosis[Title]", retmax=100)
         print(f"Found {search_res['esearchresult']['count']} articles.")
         
         # Fetching details using the search result (history)
-        details = api.fetch_details(search_res, retmax=50) 
-        print(f"Retrieved {len(details)} chunks of data.")
+        articles = list(api.fetch_details(search_res, retmax=50))
+        print(f"Retrieved {len(articles)} articles.")
     except Exception as e:
         print(f"Error: {e}")
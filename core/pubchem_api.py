@@ -1,11 +1,16 @@
+import asyncio
 import requests
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from core.cache import cached
+from core.http import build_session, RateLimiter, loads_json
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Name -> CID lookups in flight at once; matches the rate limiter's burst capacity
+MAX_CONCURRENT_LOOKUPS = 5
+
 class PubChemAPI:
     """
     Interface for the PubChem PUG REST API with robust rate limiting and error handling.
@@ -14,17 +19,13 @@ class PubChemAPI:
     BASE_URL = "https://pubchem.ncbi.nlm.nih.gov/rest/pug"
 
     def __init__(self):
-        self.last_request_time = 0
-        self.min_interval = 0.25  # 1/4 second to be safe (max 4 req/s to stay comfortably under 5)
+        self.session = build_session()
+        # PubChem allows 5 requests/sec; a bucket lets short bursts through and is safe across validator threads
+        self.rate_limiter = RateLimiter(rate=5.0, capacity=5)
 
     def _wait_for_rate_limit(self):
         """Ensures we don't exceed the rate limit."""
-        current_time = time.time()
-        elapsed = current_time - self.last_request_time
-        if elapsed < self.min_interval:
-            sleep_time = self.min_interval - elapsed
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
+        self.rate_limiter.acquire()
 
     def _make_request(self, endpoint, params=None, method="GET", data=None):
         """
@@ -39,16 +40,16 @@ class PubChemAPI:
             self._wait_for_rate_limit()
             try:
                 if method == "GET":
-                    response = requests.get(url, params=params)
+                    response = self.session.get(url, params=params)
                 elif method == "POST":
-                    response = requests.post(url, data=data, params=params)
+                    response = self.session.post(url, data=data, params=params)
                 else:
                     raise ValueError(f"Unsupported method: {method}")
 
                 # Check for rate limiting or service unavailable
                 if response.status_code in [429, 503]:
                     wait_time = backoff_factor ** retries
-                    logger.warning(f"Received {response.status_code}. Retrying in {wait_time} seconds...")
+                    logger.warning("Received %s. Retrying in %s seconds...", response.status_code, wait_time)
                     time.sleep(wait_time)
                     retries += 1
                     continue
@@ -57,32 +58,72 @@ class PubChemAPI:
                 return response
 
             except requests.exceptions.RequestException as e:
-                logger.error(f"Request failed: {e}")
+                logger.error("Request failed: %s", e)
+                # Client errors (e.g. 404 for an unknown compound name) will not succeed on retry
+                if isinstance(e, requests.exceptions.HTTPError) and e.response is not None and e.response.status_code < 500:
+                    raise
                 if retries == max_retries - 1:
                     raise
                 wait_time = backoff_factor ** retries
                 time.sleep(wait_time)
                 retries += 1
 
+    @cached("pubchem.compound")
     def get_compound_by_name(self, name):
         """Retrieves compound data by name."""
         endpoint = f"/compound/name/{name}/JSON"
         response = self._make_request(endpoint)
-        return response.json()
+        return loads_json(response)
+
+    async def aget_compound_by_name(self, name):
+        """Async mirror of get_compound_by_name: runs the blocking lookup in a worker thread."""
+        return await asyncio.to_thread(self.get_compound_by_name, name)
 
+    @cached("pubchem.cids")
     def get_compound_cids(self, name):
         """Retrieves CIDs for a given compound name."""
-        endpoint = f"/compound/name/{name}/cids/JSON"
-        response = self._make_request(endpoint)
-        return response.json()
+        # The name goes in the POST body, so names with '/' or other URL-unsafe characters resolve too
+        endpoint = "/compound/name/cids/JSON"
+        response = self._make_request(endpoint, method="POST", data={"name": name})
+        return loads_json(response)
+
+    def get_compound_cids_batch(self, names):
+        """
+        Resolves many compound names to their first CID in one pass.
+        Names are de-duplicated case-insensitively and looked up concurrently; unknown names map to None.
+        Returns {name: cid} keyed by the names as given.
+        """
+        unique = {}
+        for name in names:
+            key = (name or "").strip().lower()
+            if key and key not in unique:
+                unique[key] = name
+
+        # PUG REST accepts a single identifier per request for the name namespace, so instead of one
+        # multi-name POST the lookups overlap; the shared rate limiter keeps them within 5 req/s.
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_LOOKUPS) as executor:
+            resolved = dict(zip(unique, executor.map(self._first_cid, unique.values())))
+        return {name: resolved.get((name or "").strip().lower()) for name in names}
+
+    def _first_cid(self, name):
+        """Returns the first CID for a compound name, or None if it cannot be resolved."""
+        try:
+            data = self.get_compound_cids(name)
+            cids = data.get("IdentifierList", {}).get("CID", [])
+            return cids[0] if cids else None
+        except Exception as e:
+            logger.warning("CID lookup failed for '%s': %s", name, e)
+            return None
 
+    @cached("pubchem.assaysummary")
     def get_assay_summaries(self, cid):
         """Retrieves assay summaries for a given CID."""
         endpoint = f"/compound/cid/{cid}/assaysummary/JSON"
         response = self._make_request(endpoint)
-        return response.json()
+        return loads_json(response)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     # Example usage
     api = PubChemAPI()
     try:
@@ -1,13 +1,65 @@
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import TypedDict, List, Dict, Any, Optional, Annotated, Literal, FrozenSet, Iterable
+import operator
+
+# Skeptic verdicts, normalized from the LM's free-text answer (see agents/skeptic.py)
+Verdict = Literal["SAFE", "RISKY", "REJECT"]
+
+
+class Validation(TypedDict, total=False):
+    """Deterministic report attached to a hypothesis by the ValidatorAgent."""
+    step_1_cid_found: bool
+    step_2_target_match: bool
+    step_3_human_reviewed: bool
+    step_4_disease_link: bool
+    overall_status: str  # "APPROVED" or "REJECTED"
+    reason: str
+
+
+class Hypothesis(TypedDict, total=False):
+    """A drug repurposing hypothesis; each agent fills in its own fields as it moves through the graph."""
+    hypothesis_id: int
+    drug_name: str
+    target_gene: str
+    mechanism: str
+    rationale: str
+    source: str
+    status: str
+    skeptic_critique: str
+    skeptic_safety: str
+    skeptic_verdict: Verdict
+    cid: int
+    validation: Validation
+
+
+def merge_hypotheses(existing: List[Hypothesis], updates: List[Hypothesis]) -> List[Hypothesis]:
+    """
+    Reducer for `hypotheses`: nodes return only the hypotheses they created or amended.
+    An update carrying the `hypothesis_id` of an existing entry is merged into it;
+    anything else is appended and assigned the next `hypothesis_id`.
+    """
+    merged = list(existing or [])
+    for hypothesis in updates or []:
+        hypothesis_id = hypothesis.get("hypothesis_id")
+        if hypothesis_id is not None and hypothesis_id < len(merged):
+            merged[hypothesis_id] = {**merged[hypothesis_id], **hypothesis}
+        else:
+            merged.append({**hypothesis, "hypothesis_id": len(merged)})
+    return merged
+
+
+def union_drugs(existing: Optional[FrozenSet[str]], updates: Optional[Iterable[str]]) -> FrozenSet[str]:
+    """Reducer for `evaluated_drugs`: nodes return the drugs they proposed; the state keeps the union."""
+    return frozenset(existing or ()).union(updates or ())
+
 
 # Define the global state schema (Message Bus)
 class RareAgentState(TypedDict):
     current_disease: str
     genetic_targets: List[Dict[str, Any]]
-    hypotheses: List[Dict[str, Any]]
-    evidence: List[Dict[str, Any]]
-    debate_history: List[str]
+    hypotheses: Annotated[List[Hypothesis], merge_hypotheses]
+    evidence: Annotated[List[Dict[str, Any]], operator.add]  # one record per source: {"source", "note", "ids"}
+    debate_history: Annotated[List[str], operator.add]
     final_ranking: Optional[List[Dict[str, Any]]]
     retry_count: int
     last_rejection_reason: Optional[str]
-    evaluated_drugs: List[str]
+    evaluated_drugs: Annotated[FrozenSet[str], union_drugs]  # taboo list; O(1) membership
@@ -1,70 +1,113 @@
+import asyncio
 import requests
 import time
 import logging
 import urllib.parse
+import csv
+import re
+import io
+from concurrent.futures import ThreadPoolExecutor
+from core.cache import cached
+from core.http import build_session, loads_json
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# `<url>; rel="next"` entry of a Link header
+_LINK_NEXT_RE = re.compile(r'<([^>]+)>\s*;\s*rel="next"')
+
+# ID mapping status polling: exponential backoff from 0.2s, capped at 5s
+POLL_INITIAL_DELAY = 0.2
+POLL_BACKOFF = 1.7
+POLL_MAX_DELAY = 5.0
+
 class UniProtAPI:
     """
     Interface for UniProt REST API.
     Supports ID Mapping and Cursor-based Pagination.
     """
     API_URL = "https://rest.uniprot.org"
+    # Projection covering what the agents read: accession, gene, protein name and DISEASE comments
+    DISEASE_FIELDS = ("accession", "gene_names", "protein_name", "cc_disease")
+    # Columns returned by TSV searches when no fields are given; extend for extra columns
+    DEFAULT_FIELDS = ("accession", "gene_primary", "protein_name", "lit_pubmed_id")
 
     def __init__(self):
-        self.session = requests.Session()
-        # Retry strategy could be added to session adapters here
+        # Search pages are plain GETs, so once the API cache expires they are revalidated instead of re-downloaded
+        self.session = build_session(conditional=True)
 
     def _get_next_link(self, headers):
-        """Parses the 'link' header to find the next page URL."""
-        if "link" in headers:
-            links = headers["link"]
-            for link in links.split(","):
-                if 'rel="next"' in link:
-                    # Angle brackets might be around the URL
-                    return link[link.index("<") + 1 : link.index(">")]
-        return None
-
-    def get_uniprot_data(self, query, format="json"):
+        """Parses the 'link' header (RFC 5988) to find the next page URL."""
+        match = _LINK_NEXT_RE.search(headers.get("link", ""))
+        return match.group(1) if match else None
+
+    def get_uniprot_data(self, query, format="tsv", fields=None):
         """
         Retrieves UniProt data based on a query with cursor-based pagination.
+        `fields` projects the response server-side (e.g. UniProtAPI.DISEASE_FIELDS) to cut payload size.
+        TSV (the default, with DEFAULT_FIELDS) returns one flat {field: value} dict per entry;
+        use format="json" for nested data such as DISEASE comments.
+        Results are cached (see core/cache.py), so repeated queries skip the network.
         """
+        if format == "tsv" and not fields:
+            fields = self.DEFAULT_FIELDS
+        try:
+            return self._search(query, format, tuple(fields) if fields else None)
+        except requests.exceptions.RequestException as e:
+            logger.error("Error fetching UniProt data: %s", e)
+            return []
+
+    async def aget_uniprot_data(self, query, format="tsv", fields=None):
+        """Async mirror of get_uniprot_data: runs the blocking search in a worker thread."""
+        return await asyncio.to_thread(self.get_uniprot_data, query, format, fields)
+
+    @cached("uniprot.search")
+    def _search(self, query, format, fields):
+        """Walks every result page for a query. Raises on HTTP errors so failures are never cached."""
         endpoint = "/uniprotkb/search"
         params = {
             "query": query,
             "format": format,
             "size": 500 # Page size
         }
+        if fields:
+            params["fields"] = ",".join(fields)
         
         url = f"{self.API_URL}{endpoint}"
         all_results = []
-        
-        while url:
-            try:
-                response = self.session.get(url, params=params)
-                response.raise_for_status()
-                
+
+        # Double-buffered pagination: the next cursor is in the response headers, so page N+1 is
+        # requested in the background while page N's body is parsed.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pending = executor.submit(self._get_page, url, params)
+            while pending:
+                response = pending.result()
+
+                # Get next link for pagination (params are part of the next link URL)
+                url = self._get_next_link(response.headers)
+                pending = executor.submit(self._get_page, url) if url else None
+
                 # Check format to determine how to append
                 if format == "json":
-                    data = response.json()
+                    data = loads_json(response)
                     if "results" in data:
                         all_results.extend(data["results"])
+                elif format == "tsv":
+                    # Every page starts with its own header row; columns follow the requested field order.
+                    # TSV is served as text/plain without a charset, which requests would decode as ISO-8859-1.
+                    rows = csv.reader(io.StringIO(response.content.decode("utf-8")), delimiter="\t")
+                    next(rows, None)
+                    all_results.extend(dict(zip(fields, row)) for row in rows if row)
                 else:
                     all_results.append(response.text)
 
-                # Get next link for pagination
-                url = self._get_next_link(response.headers)
-                params = {} # Params are usually part of the next link URL, so we clear them to avoid duplication
-                
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching UniProt data: {e}")
-                break
-                
         return all_results
 
+    def _get_page(self, url, params=None):
+        """Fetches one search result page, raising on HTTP errors."""
+        response = self.session.get(url, params=params)
+        response.raise_for_status()
+        return response
+
     def map_ids(self, from_db, to_db, ids):
         """
         Submits an ID Mapping job to UniProt.
@@ -79,9 +122,9 @@ class UniProtAPI:
         try:
             response = self.session.post(f"{self.API_URL}{endpoint}", data=data)
             response.raise_for_status()
-            return response.json()["jobId"]
+            return loads_json(response)["jobId"]
         except requests.exceptions.RequestException as e:
-            logger.error(f"ID Mapping submission failed: {e}")
+            logger.error("ID Mapping submission failed: %s", e)
             raise
 
     def get_id_mapping_results(self, job_id):
@@ -91,19 +134,26 @@ class UniProtAPI:
         status_endpoint = f"/idmapping/status/{job_id}"
         results_endpoint = f"/idmapping/results/{job_id}" # Stream endpoint might be better for large sets
         
+        # Small jobs usually finish in well under a second, so poll quickly at first and back off for large ones
+        delay = POLL_INITIAL_DELAY
         while True:
             try:
-                response = self.session.get(f"{self.API_URL}{status_endpoint}")
+                # A finished job's status URL 303-redirects to its results; treat the redirect itself as "done"
+                response = self.session.get(f"{self.API_URL}{status_endpoint}", allow_redirects=False)
+                if response.status_code == 303:
+                    logger.info("Job %s finished. Fetching results...", job_id)
+                    break
                 response.raise_for_status()
-                status_data = response.json()
+                status_data = loads_json(response)
                 
                 if "jobStatus" in status_data:
                     if status_data["jobStatus"] == "RUNNING" or status_data["jobStatus"] == "NEW":
-                        logger.info(f"Job {job_id} is running...")
-                        time.sleep(2)
+                        logger.info("Job %s is running...", job_id)
+                        time.sleep(delay)
+                        delay = min(delay * POLL_BACKOFF, POLL_MAX_DELAY)
                         continue
                     elif status_data["jobStatus"] == "FINISHED":
-                        logger.info(f"Job {job_id} finished. Fetching results...")
+                        logger.info("Job %s finished. Fetching results...", job_id)
                         break
                     elif status_data["jobStatus"] == "FAILED":
                         raise Exception(f"Job {job_id} failed.")
@@ -112,7 +162,7 @@ class UniProtAPI:
                      break
                      
             except requests.exceptions.RequestException as e:
-                 logger.error(f"Error checking job status: {e}")
+                 logger.error("Error checking job status: %s", e)
                  raise
 
         # Fetch results with pagination handling
@@ -124,19 +174,20 @@ class UniProtAPI:
             try:
                 response = self.session.get(url) # Params often in next link
                 response.raise_for_status()
-                data = response.json()
+                data = loads_json(response)
                 
                 if "results" in data:
                     all_results.extend(data["results"])
                 
                 url = self._get_next_link(response.headers)
             except requests.exceptions.RequestException as e:
-                logger.error(f"Error fetching mapping results: {e}")
+                logger.error("Error fetching mapping results: %s", e)
                 break
                 
         return all_results
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     api = UniProtAPI()
     # Example: Search for BRCA1
     results = api.get_uniprot_data("gene:BRCA1 AND organism_id:9606")
@@ -1,48 +1,101 @@
 from typing import TypedDict, List, Dict, Any, Optional
+import asyncio
 import logging
+import os
 from langgraph.graph import StateGraph, END
 from agents.explorer import ExplorerAgent
 from agents.proponent import ProponentAgent
 from agents.skeptic import SkepticAgent
+from agents.proponent_skeptic import ProponentSkepticAgent
 from agents.validator import ValidatorAgent
 from core.types import RareAgentState
+from core.uniprot_api import UniProtAPI
 
-# Configure logging
+# Configure logging once for the whole process; agents and API clients only create loggers
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # Global Settings
 MAX_HYPOTHESES = 5
+# Hypotheses proposed per Proponent call. One LM round trip yields the whole batch, and the
+# critique node checks all of them concurrently; set to 1 for the one-at-a-time retry loop.
+# Kept below MAX_HYPOTHESES so a fully rejected first batch leaves budget for a corrective
+# round that sees last_rejection_reason.
+HYPOTHESIS_BATCH_SIZE = int(os.getenv("RAREAGENT_HYPOTHESIS_BATCH", "3"))
+# Opt-in: propose and critique in one LLM call instead of two. Off by default because a
+# separate Skeptic call gives a more independent critique.
+FUSED_DEBATE = os.getenv("RAREAGENT_FUSED_DEBATE", "0") == "1"
 
 
 # --- Agent Wrappers for Nodes ---
 
-explorer = ExplorerAgent()
+# Explorer and Validator share one UniProt client (and its pooled connections)
+uniprot_api = UniProtAPI()
+explorer = ExplorerAgent(uniprot_api=uniprot_api)
 proponent = ProponentAgent()
 skeptic = SkepticAgent()
-validator = ValidatorAgent()
+validator = ValidatorAgent(uniprot_api=uniprot_api)
+debater = ProponentSkepticAgent(proponent=proponent, skeptic=skeptic)
 
-def explorer_node(state: RareAgentState):
+# Nodes are async: each agent's blocking HTTP/LLM work runs in a worker thread,
+# so the event loop driving the graph is never blocked on a socket.
+
+async def explorer_node(state: RareAgentState):
     logger.info("--- Node: Explorer ---")
-    return explorer.run(state)
+    return await explorer.arun(state)
 
-def proponent_node(state: RareAgentState):
+async def proponent_node(state: RareAgentState):
     logger.info("--- Node: Proponent ---")
-    return proponent.run(state)
+    remaining = MAX_HYPOTHESES - len(state.get("hypotheses", []))
+    return await proponent.arun_batch(state, k=max(1, min(HYPOTHESIS_BATCH_SIZE, remaining)))
+
+async def critique_node(state: RareAgentState):
+    """
+    Skeptic and Validator both work on the Proponent's fresh hypothesis and don't read each
+    other's output, so they run concurrently: the node takes max(T_skeptic, T_validator).
+    """
+    logger.info("--- Node: Skeptic + Validator ---")
+    skeptic_updates, validator_updates = await asyncio.gather(skeptic.arun(state), validator.arun(state))
+    return _merge_critique(skeptic_updates, validator_updates)
+
+def _merge_critique(skeptic_updates: Dict[str, Any], validator_updates: Dict[str, Any]) -> Dict[str, Any]:
+    """Combines the Skeptic and Validator copies of each hypothesis into one update per hypothesis_id."""
+    merged: Dict[int, Dict[str, Any]] = {}
+    for h in skeptic_updates.get("hypotheses", []) + validator_updates.get("hypotheses", []):
+        merged.setdefault(h["hypothesis_id"], {}).update(h)
+    return {
+        **skeptic_updates,
+        **validator_updates,
+        "hypotheses": [merged[i] for i in sorted(merged)]
+    }
 
-def skeptic_node(state: RareAgentState):
-    logger.info("--- Node: Skeptic ---")
-    return skeptic.run(state)
+async def debate_node(state: RareAgentState):
+    logger.info("--- Node: Proponent+Skeptic ---")
+    return await debater.arun(state)
 
-def validator_node(state: RareAgentState):
+async def validator_node(state: RareAgentState):
     logger.info("--- Node: Validator ---")
-    return validator.run(state)
+    return await validator.arun(state)
 
 # --- Conditional Logic ---
 
+# Skeptic verdicts that let a hypothesis pass (strictness adjustable)
+SAFE_VERDICTS = frozenset({"SAFE"})
+
+def _is_safe(hypothesis: Dict[str, Any]) -> bool:
+    """
+    Clinical safety per the Skeptic. A missing or unrecognized verdict (failed or ambiguous
+    critique) is not a clearance, so it counts as unsafe.
+    """
+    return hypothesis.get("skeptic_verdict") in SAFE_VERDICTS
+
+def _is_approved_and_safe(hypothesis: Dict[str, Any]) -> bool:
+    """Technical validity per the Validator and clinical safety per the Skeptic."""
+    return hypothesis.get("validation", {}).get("overall_status") == "APPROVED" and _is_safe(hypothesis)
+
 def should_continue(state: RareAgentState):
     """
-    Decides whether to loop back to Proponent or end.
+    Decides whether to loop back to Proponent (or the fused debate node) or end.
     """
     hypotheses = state.get("hypotheses", [])
     retry_count = state.get("retry_count", 0)
@@ -52,26 +105,20 @@ def should_continue(state: RareAgentState):
         logger.info("No hypotheses generated. Ending.")
         return END
 
-    latest_hypothesis = hypotheses[-1]
-    validation = latest_hypothesis.get("validation", {})
-    skeptic_verdict = latest_hypothesis.get("skeptic_verdict", "UNKNOWN")
-    
-    # 1. Check Technical Validity (Validator)
-    is_valid = validation.get("overall_status") == "APPROVED"
-    
-    # 2. Check Clinical Safety (Skeptic)
-    is_safe = skeptic_verdict != "REJECT" and skeptic_verdict != "RISKY" # Strictness adjustable
+    # The budget check is the cheap signal: once it's spent the run ends whatever the verdicts say
+    if retry_count >= MAX_HYPOTHESES or len(hypotheses) >= MAX_HYPOTHESES:
+        logger.info("Max hypotheses reached. Ending.")
+        return END
 
-    if is_valid and is_safe:
+    # A batch round adds several hypotheses at once: finish as soon as any of them passes
+    if any(_is_approved_and_safe(h) for h in hypotheses):
         logger.info("Hypothesis Approved and Safe. Finishing.")
         return END
-    
-    if retry_count < MAX_HYPOTHESES:
-        logger.info(f"Hypothesis Rejected (Valid: {is_valid}, Safe: {is_safe}). Retrying ({retry_count + 1}/{MAX_HYPOTHESES})...")
-        return "proponent"
-    
-    logger.info("Max hypotheses reached. Ending.")
-    return END
+
+    latest_hypothesis = hypotheses[-1]
+    is_valid = latest_hypothesis.get("validation", {}).get("overall_status") == "APPROVED"
+    logger.info("Hypothesis Rejected (Valid: %s, Safe: %s). Retrying (%s/%s)...", is_valid, _is_safe(latest_hypothesis), retry_count + 1, MAX_HYPOTHESES)
+    return "debate" if FUSED_DEBATE else "proponent"
 
 # --- Build the Graph ---
 
@@ -80,24 +127,32 @@ def build_graph():
 
     # Add Nodes
     workflow.add_node("explorer", explorer_node)
-    workflow.add_node("proponent", proponent_node)
-    workflow.add_node("skeptic", skeptic_node)
-    workflow.add_node("validator", validator_node)
+    if FUSED_DEBATE:
+        workflow.add_node("debate", debate_node)
+        workflow.add_node("validator", validator_node)
+    else:
+        workflow.add_node("proponent", proponent_node)
+        workflow.add_node("critique", critique_node)
 
     # Set Entry Point
     workflow.set_entry_point("explorer")
 
     # Add Edges
-    workflow.add_edge("explorer", "proponent")
-    workflow.add_edge("proponent", "skeptic")
-    workflow.add_edge("skeptic", "validator")
+    if FUSED_DEBATE:
+        workflow.add_edge("explorer", "debate")
+        workflow.add_edge("debate", "validator")
+        retry_node, decision_node = "debate", "validator"
+    else:
+        workflow.add_edge("explorer", "proponent")
+        workflow.add_edge("proponent", "critique")
+        retry_node, decision_node = "proponent", "critique"
     
-    # Conditional Edge from Validator
+    # Conditional Edge once the latest hypothesis is validated
     workflow.add_conditional_edges(
-        "validator",
+        decision_node,
         should_continue,
         {
-            "proponent": "proponent",
+            retry_node: retry_node,
             END: END
         }
     )
@@ -105,13 +160,12 @@ def build_graph():
     app = workflow.compile()
     return app
 
-# wrapper for UI streaming
-def run_research(disease_name: str):
-    """
-    Runs the research workflow and yields state for UI updates.
-    """
-    app = build_graph()
-    initial_state = {
+# Compiled once at import: the graph's shape only depends on FUSED_DEBATE, and a compiled graph
+# holds no per-run state, so every research run streams through the same app.
+APP = build_graph()
+
+def _initial_state(disease_name: str) -> RareAgentState:
+    return {
         "current_disease": disease_name,
         "genetic_targets": [],
         "hypotheses": [],
@@ -120,23 +174,74 @@ def run_research(disease_name: str):
         "final_ranking": None,
         "retry_count": 0,
         "last_rejection_reason": None,
-        "evaluated_drugs": []
+        "evaluated_drugs": frozenset()
     }
-    
-    # Stream events if possible, or just yield final
-    # LangGraph .stream() yields events
-    for event in app.stream(initial_state):
-        yield event
+
+_MISSING = object()
+_SCALARS = (str, int, float, bool, type(None))
+
+def _changed_keys(update: Dict[str, Any], last_seen: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Drops the keys of a node update that repeat what an earlier event already carried (e.g. an
+    unchanged retry_count). Containers are compared by identity only, so large lists are never deep-diffed.
+    `last_seen` is updated in place.
+    """
+    delta = {}
+    for key, value in update.items():
+        previous = last_seen.get(key, _MISSING)
+        if previous is value or (isinstance(value, _SCALARS) and previous == value):
+            continue
+        delta[key] = value
+        last_seen[key] = value
+    return delta
+
+# Key of the event announcing that a node has started; its value is the node name
+NODE_STARTED = "node_started"
+
+async def arun_research(disease_name: str):
+    """
+    Runs the research workflow and yields events for UI updates.
+    Built on LangGraph's astream_events: {NODE_STARTED: node} as soon as a node starts, so the UI
+    can show which agent is working, then {node: state_update} when it finishes, minus the keys
+    whose value didn't change since an earlier event.
+    """
+    last_seen = {}
+    async for event in APP.astream_events(_initial_state(disease_name), version="v2"):
+        node = event["metadata"].get("langgraph_node")
+        # Skip the graph's own events and runnables nested in a node (e.g. the conditional edge)
+        if node is None or event["name"] != node:
+            continue
+        if event["event"] == "on_chain_start":
+            yield {NODE_STARTED: node}
+        elif event["event"] == "on_chain_end":
+            yield {node: _changed_keys(event["data"].get("output") or {}, last_seen)}
+
+# wrapper for UI streaming
+def run_research(disease_name: str):
+    """
+    Sync bridge over arun_research for callers without an event loop (e.g. the Streamlit script).
+    Each event is yielded as soon as its node finishes.
+    """
+    loop = asyncio.new_event_loop()
+    events = arun_research(disease_name)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(events.aclose())
+        loop.close()
 
 if __name__ == "__main__":
     # Test Run
     print("Starting Orchestrator Test...")
-    app = build_graph()
-    result = app.invoke({
+    result = asyncio.run(APP.ainvoke({
         "current_disease": "Cystic Fibrosis", 
         "retry_count": 0,
         "hypotheses": [],
         "debate_history": []
-    })
+    }))
     print("\nResult Keys:", result.keys())
     print("Hypotheses:", len(result.get("hypotheses", [])))
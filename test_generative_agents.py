@@ -6,6 +6,8 @@ sys.path.append(os.getcwd())
 
 from agents.proponent import ProponentAgent
 from agents.skeptic import SkepticAgent
+from core.llm import configure_lm
+from core.llm_cache import cache_hits
 
 def test_generative_agents():
     print("\n--- Testing Generative Agents with Mock LM ---")
@@ -25,16 +27,9 @@ def test_generative_agents():
         "verdict": "RISKY"
     }
     
-    # Configure dspy with Groq LM
-    from dotenv import load_dotenv
-    load_dotenv()
-
-    api_key = os.environ.get('GROQ_API_KEY')
-    if not api_key:
-        print("WARNING: GROQ_API_KEY not found! Please check your .env file.")
-        raise ValueError("GROQ_API_KEY environment variable not set")
-    lm = dspy.LM(model='groq/llama-3.3-70b-versatile', api_key=api_key)
-    dspy.settings.configure(lm=lm)
+    # Configure dspy with the shared Groq LM (JSON mode, persistent response cache:
+    # a second run of this test costs no Groq tokens)
+    lm = configure_lm()
 
     # 1. Test Proponent
     print("Run Proponent...")
@@ -70,6 +65,8 @@ def test_generative_agents():
     if hypotheses_s:
          print(f"Hypothesis Verdict: {hypotheses_s[0].get('skeptic_verdict')}")
 
+    print(f"\nLM cache hits: {cache_hits(lm)}/{len(lm.history)}")
+
 if __name__ == "__main__":
     try:
         test_generative_agents()
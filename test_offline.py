@@ -0,0 +1,318 @@
+import sys
+import os
+import io
+import time
+import tempfile
+import requests
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.getcwd())
+
+# Keep the cache tests away from the real API cache; must be set before core.cache is imported
+os.environ["RAREAGENT_CACHE_DIR"] = tempfile.mkdtemp(prefix="rareagent-cache-")
+
+from core import cache
+from core.http import build_session
+from core.uniprot_api import UniProtAPI
+from agents.skeptic import _normalize_verdict
+from core.types import merge_hypotheses, union_drugs
+from core.ncbi_entrez import NCBIEntrezAPI
+from langgraph.graph import END
+from orchestrator import should_continue, _merge_critique, _changed_keys, MAX_HYPOTHESES, HYPOTHESIS_BATCH_SIZE, FUSED_DEBATE
+from agents.validator import ValidatorAgent, _compile_disease_pattern
+
+def _tsv_page(body, next_url=None):
+    """A stubbed UniProt TSV search page, as served: UTF-8 bytes labelled text/plain without a charset."""
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body.encode("utf-8")
+    response.headers["Content-Type"] = "text/plain"
+    if next_url:
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    # What requests' HTTPAdapter derives from the headers (ISO-8859-1 for text/* without a charset)
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+def test_uniprot_tsv_search():
+    print("\n--- Testing UniProt TSV search parsing ---")
+    header = "Entry\tGene Names (primary)\tProtein names\tPubMed ID\n"
+    pages = {
+        None: _tsv_page(header + "P13569\tCFTR\tCystic fibrosis transmembrane conductance regulator\t2475911; 2570460\n", "https://rest.uniprot.org/next"),
+        "https://rest.uniprot.org/next": _tsv_page(header + "Q9XYZ1\tABC1\tProtéine β-lactamase\t\n\n")
+    }
+    api = UniProtAPI()
+    api._get_page = lambda url, params=None: pages[None if params else url]
+
+    results = api.get_uniprot_data("gene:CFTR test-tsv-search")
+    assert results == [
+        {"accession": "P13569", "gene_primary": "CFTR", "protein_name": "Cystic fibrosis transmembrane conductance regulator", "lit_pubmed_id": "2475911; 2570460"},
+        {"accession": "Q9XYZ1", "gene_primary": "ABC1", "protein_name": "Protéine β-lactamase", "lit_pubmed_id": ""}
+    ], results
+    print(f"Success: Parsed {len(results)} entries from 2 TSV pages, skipping each page's header row")
+
+class _ConditionalHandler(BaseHTTPRequestHandler):
+    """Serves one page with an ETag and answers 304 once the client revalidates with it."""
+    ETAG = '"v1"'
+    BODY = "P13569\tCystic fibrosis transmembrane conductance regulator\n".encode("utf-8")
+    statuses = []
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == self.ETAG:
+            self.statuses.append(304)
+            self.send_response(304)
+            self.send_header("ETag", self.ETAG)
+            self.end_headers()
+            return
+        self.statuses.append(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(self.BODY)))
+        self.send_header("ETag", self.ETAG)
+        self.send_header("Link", '<https://rest.uniprot.org/next>; rel="next"')
+        self.end_headers()
+        self.wfile.write(self.BODY)
+
+    def log_message(self, *args):
+        pass
+
+def test_conditional_session():
+    print("\n--- Testing ConditionalSession revalidation ---")
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ConditionalHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/search"
+    session = build_session(retries=0, conditional=True)
+    try:
+        fresh = session.get(url, params={"query": "cftr"})
+        replayed = session.get(url, params={"query": "cftr"})
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert _ConditionalHandler.statuses == [200, 304]
+    assert replayed.status_code == fresh.status_code == 200
+    assert replayed.content == fresh.content == _ConditionalHandler.BODY
+    assert replayed.headers["Content-Type"] == "text/plain"
+    assert replayed.headers["Link"] == fresh.headers["Link"]
+    assert replayed.encoding == fresh.encoding == "ISO-8859-1"
+    assert replayed.text == fresh.text
+    print("Success: A 304 is replayed as the stored 200 with the same body, headers and encoding")
+
+def test_cached_expiry():
+    print("\n--- Testing cached() expiry ---")
+    cache.clear_cache()
+
+    class Client:
+        calls = 0
+
+        @cache.cached("test-expiry", expire=1)
+        def lookup(self, term):
+            Client.calls += 1
+            return f"{term}-{Client.calls}"
+
+    client = Client()
+    assert client.lookup("cftr") == "cftr-1"
+    assert client.lookup("cftr") == "cftr-1", "Second call should be served from cache"
+    assert Client.calls == 1
+
+    time.sleep(1.2)
+    # Both the in-process LRU and the disk entry must have expired
+    assert client.lookup("cftr") == "cftr-2"
+    assert Client.calls == 2
+
+    # A memory miss must still be answered from disk while the entry is fresh
+    with cache._memory_lock:
+        cache._memory_cache.clear()
+    assert client.lookup("cftr") == "cftr-2"
+    assert Client.calls == 2
+    cache.clear_cache()
+    print("Success: Cached values expire from memory and disk after `expire` seconds")
+
+def test_normalize_verdict():
+    print("\n--- Testing Skeptic verdict normalization ---")
+    assert _normalize_verdict("'safe'.") == "SAFE"
+    assert _normalize_verdict(' "Risky" ') == "RISKY"
+    assert _normalize_verdict("**REJECT**") == "REJECT"
+    assert _normalize_verdict(None) == ""
+    print("Success: Verdicts are stripped of quotes, punctuation and case")
+
+def test_merge_hypotheses():
+    print("\n--- Testing hypotheses reducer ---")
+    existing = merge_hypotheses([], [{"drug_name": "Ivacaftor"}, {"drug_name": "Aspirin"}])
+    assert [h["hypothesis_id"] for h in existing] == [0, 1]
+
+    merged = merge_hypotheses(existing, [{"hypothesis_id": 1, "skeptic_verdict": "RISKY"}, {"drug_name": "Metformin"}])
+    assert merged[1] == {"drug_name": "Aspirin", "hypothesis_id": 1, "skeptic_verdict": "RISKY"}
+    assert merged[2] == {"drug_name": "Metformin", "hypothesis_id": 2}
+    assert "skeptic_verdict" not in existing[1], "merge_hypotheses must not mutate its input"
+    assert merge_hypotheses(None, None) == []
+    print("Success: Updates merge by hypothesis_id and new hypotheses are appended")
+
+def test_union_drugs():
+    print("\n--- Testing evaluated_drugs reducer ---")
+    assert union_drugs(None, ["Aspirin"]) == frozenset({"Aspirin"})
+    assert union_drugs(frozenset({"Aspirin"}), ["Ivacaftor", "Aspirin"]) == frozenset({"Aspirin", "Ivacaftor"})
+    assert union_drugs(frozenset({"Aspirin"}), None) == frozenset({"Aspirin"})
+    print("Success: Evaluated drugs are unioned into a frozenset")
+
+PUBMED_FIXTURE = b"""<?xml version="1.0" ?>
+<PubmedArticleSet>
+  <PubmedArticle>
+    <MedlineCitation>
+      <PMID Version="1">111</PMID>
+      <Article>
+        <ArticleTitle>CFTR modulators in <i>cystic</i> fibrosis</ArticleTitle>
+        <Abstract>
+          <AbstractText Label="BACKGROUND">Ivacaftor potentiates CFTR.</AbstractText>
+          <AbstractText Label="RESULTS">Lung function improved.</AbstractText>
+        </Abstract>
+      </Article>
+      <MeshHeadingList>
+        <MeshHeading><DescriptorName UI="D003550">Cystic Fibrosis</DescriptorName></MeshHeading>
+        <MeshHeading><DescriptorName UI="D019005">Cystic Fibrosis Transmembrane Conductance Regulator</DescriptorName></MeshHeading>
+      </MeshHeadingList>
+    </MedlineCitation>
+  </PubmedArticle>
+  <PubmedArticle>
+    <MedlineCitation>
+      <PMID Version="1">222</PMID>
+      <Article>
+        <ArticleTitle>An article without an abstract</ArticleTitle>
+      </Article>
+    </MedlineCitation>
+  </PubmedArticle>
+</PubmedArticleSet>
+"""
+
+def test_iter_articles():
+    print("\n--- Testing PubMed XML parsing ---")
+    articles = list(NCBIEntrezAPI._iter_articles(io.BytesIO(PUBMED_FIXTURE)))
+    assert len(articles) == 2
+    first, second = articles
+    assert first["pmid"] == "111"
+    assert first["title"] == "CFTR modulators in cystic fibrosis"
+    assert first["abstract"] == "Ivacaftor potentiates CFTR. Lung function improved."
+    assert first["mesh"] == ["Cystic Fibrosis", "Cystic Fibrosis Transmembrane Conductance Regulator"]
+    assert second == {"pmid": "222", "title": "An article without an abstract", "abstract": "", "mesh": []}
+    assert all(type(article["pmid"]) is str for article in articles)
+    print("Success: Parsed 2 articles from the fixture PubmedArticleSet")
+
+def test_should_continue_budget():
+    print("\n--- Testing should_continue budget handling ---")
+    retry = "debate" if FUSED_DEBATE else "proponent"
+    rejected = {"drug_name": "Aspirin", "validation": {"overall_status": "REJECTED"}, "skeptic_verdict": "SAFE"}
+    approved_risky = {"drug_name": "Aspirin", "validation": {"overall_status": "APPROVED"}, "skeptic_verdict": "RISKY"}
+    approved_safe = {"drug_name": "Ivacaftor", "validation": {"overall_status": "APPROVED"}, "skeptic_verdict": "SAFE"}
+
+    assert should_continue({"hypotheses": [], "retry_count": 0}) == END
+    assert should_continue({"hypotheses": [rejected], "retry_count": 1}) == retry
+    assert should_continue({"hypotheses": [approved_risky], "retry_count": 1}) == retry
+    assert should_continue({"hypotheses": [rejected], "retry_count": MAX_HYPOTHESES}) == END
+    # A rejected first batch leaves budget for a corrective round fed with the rejection reason
+    assert HYPOTHESIS_BATCH_SIZE < MAX_HYPOTHESES
+    assert should_continue({"hypotheses": [rejected] * HYPOTHESIS_BATCH_SIZE, "retry_count": 1}) == retry
+    # A batch round can exhaust the budget before retry_count does
+    assert should_continue({"hypotheses": [rejected] * MAX_HYPOTHESES, "retry_count": 1}) == END
+    # A failed or unparseable critique must not pass as safe
+    approved_unchecked = {"drug_name": "Aspirin", "validation": {"overall_status": "APPROVED"}}
+    assert should_continue({"hypotheses": [approved_unchecked], "retry_count": 1}) == retry
+    assert should_continue({"hypotheses": [{**approved_unchecked, "skeptic_verdict": "PROBABLY SAFE"}], "retry_count": 1}) == retry
+    # Any approved and safe hypothesis in the batch ends the run, not just the latest one
+    assert should_continue({"hypotheses": [approved_safe, rejected], "retry_count": 1}) == END
+    print(f"Success: should_continue ends on approval or after {MAX_HYPOTHESES} hypotheses")
+
+def _disease_entry(disease_id="", acronym="", description="", note=""):
+    """A UniProt entry with one DISEASE comment and an unrelated protein name."""
+    return {
+        "comments": [{
+            "commentType": "DISEASE",
+            "note": {"text": note},
+            "disease": {"diseaseId": disease_id, "acronym": acronym, "description": description}
+        }],
+        "proteinDescription": {"recommendedName": {"fullName": {"value": "Chloride channel protein"}}}
+    }
+
+def test_disease_link_matching():
+    print("\n--- Testing Validator disease-link matching ---")
+    pattern = _compile_disease_pattern("cystic fibrosis (cf)")
+    assert pattern.search("cystic fibrosis (cf)")
+    assert pattern.search("a form of cystic fibrosis")
+    assert pattern.search("patients with cf and bronchiectasis")
+    assert not pattern.search("cftr-related metabolic syndrome"), "An alias must only match as a whole word"
+    assert not pattern.search("scfa levels")
+
+    validator = ValidatorAgent()
+    check = validator._make_disease_link_checker("Cystic Fibrosis (CF)")
+    assert check(_disease_entry(disease_id="Cystic fibrosis"))
+    assert check(_disease_entry(acronym="CF"))
+    assert not check(_disease_entry(disease_id="CFTR-related disorder", description="Congenital absence of the vas deferens"))
+
+    # Reverse direction: a database disease name or acronym inside the user's input
+    reverse = validator._make_disease_link_checker("Classic Cystic Fibrosis")
+    assert reverse(_disease_entry(disease_id="Cystic fibrosis", description="Exocrine gland disorder"))
+
+    # Empty database strings are dropped, so they no longer match every input
+    assert not check(_disease_entry())
+    assert not reverse(_disease_entry(disease_id="", acronym=""))
+    assert not validator._make_disease_link_checker("")(_disease_entry(disease_id="Cystic fibrosis"))
+    print("Success: Disease names, whole-word aliases and reverse acronyms match; empty strings don't")
+
+def test_merge_critique():
+    print("\n--- Testing critique node merge ---")
+    skeptic_updates = {
+        "hypotheses": [
+            {"hypothesis_id": 1, "drug_name": "Aspirin", "skeptic_verdict": "RISKY"},
+            {"hypothesis_id": 0, "drug_name": "Ivacaftor", "skeptic_verdict": "SAFE"}
+        ],
+        "debate_history": ["### Skeptic Critique: Aspirin", "### Skeptic Critique: Ivacaftor"]
+    }
+    validator_updates = {
+        "hypotheses": [
+            {"hypothesis_id": 0, "drug_name": "Ivacaftor", "cid": 5280, "validation": {"overall_status": "APPROVED"}},
+            {"hypothesis_id": 1, "drug_name": "Aspirin", "cid": 2244, "validation": {"overall_status": "REJECTED"}}
+        ],
+        "retry_count": 1,
+        "last_rejection_reason": "Target not linked"
+    }
+    merged = _merge_critique(skeptic_updates, validator_updates)
+    assert merged["hypotheses"] == [
+        {"hypothesis_id": 0, "drug_name": "Ivacaftor", "skeptic_verdict": "SAFE", "cid": 5280, "validation": {"overall_status": "APPROVED"}},
+        {"hypothesis_id": 1, "drug_name": "Aspirin", "skeptic_verdict": "RISKY", "cid": 2244, "validation": {"overall_status": "REJECTED"}}
+    ]
+    assert merged["debate_history"] == skeptic_updates["debate_history"]
+    assert merged["retry_count"] == 1
+    assert merged["last_rejection_reason"] == "Target not linked"
+    # Either agent may have nothing to add
+    assert _merge_critique({}, validator_updates)["hypotheses"] == sorted(validator_updates["hypotheses"], key=lambda h: h["hypothesis_id"])
+    assert _merge_critique({}, {}) == {"hypotheses": []}
+    print("Success: Skeptic and Validator copies merge into one update per hypothesis_id")
+
+def test_changed_keys():
+    print("\n--- Testing streamed update de-duplication ---")
+    last_seen = {}
+    hypotheses = [{"hypothesis_id": 0, "drug_name": "Ivacaftor"}]
+    first = {"hypotheses": hypotheses, "retry_count": 0, "last_rejection_reason": None}
+    assert _changed_keys(first, last_seen) == first
+
+    # Repeated scalars are dropped, as is the very same container object
+    assert _changed_keys({"hypotheses": hypotheses, "retry_count": 0, "last_rejection_reason": None}, last_seen) == {}
+
+    # A fresh container is kept even when equal, since containers are compared by identity only
+    fresh = [dict(hypotheses[0])]
+    assert _changed_keys({"hypotheses": fresh, "retry_count": 0}, last_seen) == {"hypotheses": fresh}
+    assert _changed_keys({"retry_count": 1, "last_rejection_reason": "Target not linked"}, last_seen) == {"retry_count": 1, "last_rejection_reason": "Target not linked"}
+    assert last_seen["hypotheses"] is fresh and last_seen["retry_count"] == 1
+    print("Success: Repeated scalars are dropped and fresh containers are kept")
+
+if __name__ == "__main__":
+    test_uniprot_tsv_search()
+    test_conditional_session()
+    test_cached_expiry()
+    test_normalize_verdict()
+    test_merge_hypotheses()
+    test_union_drugs()
+    test_iter_articles()
+    test_should_continue_budget()
+    test_disease_link_matching()
+    test_merge_critique()
+    test_changed_keys()
@@ -1,5 +1,12 @@
+import functools
+import itertools
+import numpy as np
 import plotly.graph_objects as go
-import random
+import plotly.io as pio
+
+# Streamlit ships every figure as plotly.io.to_json(); orjson serializes the float arrays in C.
+# "auto" would silently fall back to the pure-Python json encoder if orjson failed to import.
+pio.json.config.default_engine = "orjson"
 
 # Color palette for multiple drug traces
 TRACE_COLORS = [
@@ -7,64 +14,84 @@ TRACE_COLORS = [
     '#19d3f3', '#ff6692', '#b6e880', '#ff97ff', '#fecb52'
 ]
 
+RADAR_CATEGORIES = ('Target Affinity', 'Safety Profile', 'Pathway Overlap', 'Novelty', 'Skeptic Approval')
+
+# Figure layout shared by every chart; only the title is set per figure
+_LAYOUT = dict(
+    polar=dict(
+        radialaxis=dict(
+            visible=True,
+            range=[0, 100]
+        )
+    ),
+    showlegend=True,
+    template="plotly_dark",
+    paper_bgcolor='rgba(0,0,0,0)',
+    plot_bgcolor='rgba(0,0,0,0)',
+    font=dict(color="white"),
+    legend=dict(
+        orientation="h",
+        yanchor="bottom",
+        y=-0.15,
+        xanchor="center",
+        x=0.5
+    )
+)
+
+def scores_signature(hypotheses_list: list) -> tuple:
+    """
+    Hashable summary of everything the chart is drawn from: (drug_name, validated, skeptic_verdict) per hypothesis.
+    Updates that only touch other fields (e.g. critique text) leave it unchanged.
+    """
+    return tuple(
+        (
+            hypothesis.get("drug_name", f"Drug {i+1}"),
+            hypothesis.get("validation", {}).get("overall_status") == "APPROVED",
+            hypothesis.get("skeptic_verdict", "UNKNOWN")
+        )
+        for i, hypothesis in enumerate(hypotheses_list)
+    )
+
 def create_radar_chart(hypotheses_list: list):
     """
     Generates a Plotly Radar Chart overlaying ALL evaluated drug hypotheses.
     Each drug gets its own semi-transparent trace for easy comparison.
+    Figures are memoized per scores signature and shared, so treat the result as read-only.
     """
     if not hypotheses_list:
         return None
+    return _cached_radar_chart(scores_signature(hypotheses_list))
 
-    categories = ['Target Affinity', 'Safety Profile', 'Pathway Overlap', 'Novelty', 'Skeptic Approval']
-
+@functools.lru_cache(maxsize=32)
+def _cached_radar_chart(signature: tuple):
     fig = go.Figure()
 
-    for i, hypothesis in enumerate(hypotheses_list):
-        drug_name = hypothesis.get("drug_name", f"Drug {i+1}")
+    # Mock overlap/novelty scores for every drug in one draw each (bounds as random.randint, inclusive)
+    n = len(signature)
+    rng = np.random.default_rng()
+    overlaps = rng.integers(60, 96, n).tolist()
+    novelties = rng.integers(50, 91, n).tolist()
+    colors = itertools.cycle(TRACE_COLORS)
 
+    for i, (drug_name, is_valid, skeptic_verdict) in enumerate(signature):
         # Extract real scores or generate mock scores for the demo
-        is_valid = hypothesis.get("validation", {}).get("overall_status") == "APPROVED"
-        skeptic_verdict = hypothesis.get("skeptic_verdict", "UNKNOWN")
-
         score_affinity = 85 if is_valid else 40
         score_safety = 90 if skeptic_verdict == "SAFE" else (60 if skeptic_verdict == "RISKY" else 20)
-        score_overlap = random.randint(60, 95)
-        score_novelty = random.randint(50, 90)
+        score_overlap = overlaps[i]
+        score_novelty = novelties[i]
         score_approval = 95 if skeptic_verdict == "SAFE" else (50 if skeptic_verdict == "RISKY" else 10)
 
         values = [score_affinity, score_safety, score_overlap, score_novelty, score_approval]
 
-        color = TRACE_COLORS[i % len(TRACE_COLORS)]
-
         fig.add_trace(go.Scatterpolar(
             r=values,
-            theta=categories,
+            theta=RADAR_CATEGORIES,
             fill='toself',
             name=drug_name,
-            line_color=color,
+            line_color=next(colors),
             opacity=0.6
         ))
 
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 100]
-            )
-        ),
-        title="Multi-Drug Comparative Assessment",
-        showlegend=True,
-        template="plotly_dark",
-        paper_bgcolor='rgba(0,0,0,0)',
-        plot_bgcolor='rgba(0,0,0,0)',
-        font=dict(color="white"),
-        legend=dict(
-            orientation="h",
-            yanchor="bottom",
-            y=-0.15,
-            xanchor="center",
-            x=0.5
-        )
-    )
+    fig.update_layout({**_LAYOUT, "title": "Multi-Drug Comparative Assessment"})
 
     return fig